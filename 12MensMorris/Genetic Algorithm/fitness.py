@@ -0,0 +1,155 @@
+# fitness.py
+
+# Fitness functions and a FitnessEvaluator that scores a whole population at
+# once, in a process pool, remembering the score of every individual it has
+# seen so unchanged individuals are not scored again in later generations.
+# Fitness functions must be picklable (module-level functions or instances
+# of module-level classes) to run in the pool.
+
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Game playouts use the bitboard engine and minimax from the Q-learning code
+Q_LEARNING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Q_learning')
+if Q_LEARNING_DIR not in sys.path:
+    sys.path.append(Q_LEARNING_DIR)
+
+from bitboard_game import BitboardMorrisGame
+from board import turn_for_move
+from minimax import MinimaxAlgorithm
+
+# Scores remembered by a FitnessEvaluator before the oldest are dropped
+MAX_CACHE_ENTRIES = 100000
+
+
+def mill_difference(game):
+    return game.count_mills('X') - game.count_mills('O')
+
+
+def board_key(game):
+    return tuple(game.board)
+
+
+class MatchFitness:
+    # Fitness as the score ('X' wins 1, draws 0.5) over a number of games
+    # against a reference opponent playing 'O', either 'random' or 'minimax'
+    # searching to opponent_depth. By default the individual is a MorrisGame
+    # whose position the games start from, with 'X' playing random moves;
+    # pass player(individual, game, rng) to choose 'X' moves instead.
+
+    def __init__(self, games=10, opponent='minimax', opponent_depth=2, player=None, max_plies=200, seed=0):
+        self.games = games
+        self.opponent = opponent
+        self.opponent_depth = opponent_depth
+        self.player = player
+        self.max_plies = max_plies
+        self.seed = seed
+
+    def start_position(self, individual):
+        if hasattr(individual, 'board'):
+            return BitboardMorrisGame.from_game(individual)
+        return BitboardMorrisGame()
+
+    def __call__(self, individual):
+        # Seeded from the individual, so the same individual always gets the same score
+        rng = random.Random(f"{self.seed}:{getattr(individual, 'board', individual)!r}")
+        score = 0.0
+        for _ in range(self.games):
+            winner = self.play_game(individual, rng)
+            if winner == 'X':
+                score += 1
+            elif winner == 'Draw':
+                score += 0.5
+        return score / self.games
+
+    def play_game(self, individual, rng):
+        game = self.start_position(individual)
+        minimax = MinimaxAlgorithm(game) if self.opponent == 'minimax' else None
+        for _ in range(self.max_plies):
+            if game.check_winner():
+                break
+            valid_moves = game.get_all_valid_moves()
+            if not valid_moves:
+                break
+            if game.current_player == 'X' and self.player is not None:
+                # A mill closed by the player's move captures a random piece
+                turn = turn_for_move(game.turns(), self.player(individual, game, rng), rng)
+            elif game.current_player == 'O' and minimax is not None:
+                turn = minimax.find_best_turn(self.opponent_depth)
+            else:
+                turn = rng.choice(game.turns())
+            if turn is None:
+                break
+            game.make_turn(turn)
+        return game.check_winner() or self.adjudicate(game)
+
+    def adjudicate(self, game):
+        # Games cut off by max_plies (or stuck) are settled like check_winner
+        # settles a finished placing phase: by mill count
+        difference = game.count_mills('X') - game.count_mills('O')
+        if difference > 0:
+            return 'X'
+        if difference < 0:
+            return 'O'
+        return 'Draw'
+
+
+def score_individual(fitness, individual):
+    return fitness(individual)
+
+
+class FitnessEvaluator:
+    # workers=1 scores in this process, which is best for cheap fitness
+    # functions; otherwise a process pool with that many workers (None means
+    # one per CPU) is started on first use and kept until close().
+
+    def __init__(self, fitness, workers=1, key=board_key, max_cache_entries=MAX_CACHE_ENTRIES):
+        self.fitness = fitness
+        self.workers = workers
+        self.key = key
+        self.max_cache_entries = max_cache_entries
+        self.cache = {}
+        self.executor = None
+        self.evaluations = 0
+        self.cache_hits = 0
+
+    def evaluate(self, population):
+        # Returns one score per individual, in population order
+        keys = [self.key(individual) for individual in population]
+        pending = {}
+        for key, individual in zip(keys, population):
+            if key not in self.cache and key not in pending:
+                pending[key] = individual
+        self.cache_hits += len(population) - len(pending)
+        if pending:
+            individuals = list(pending.values())
+            if self.workers == 1:
+                scores = [self.fitness(individual) for individual in individuals]
+            else:
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(self.workers)
+                chunksize = max(1, len(individuals) // (4 * (self.workers or os.cpu_count() or 1)))
+                scores = list(self.executor.map(score_individual, [self.fitness] * len(individuals), individuals,
+                                                chunksize=chunksize))
+            self.evaluations += len(individuals)
+            self.cache.update(zip(pending, scores))
+        scores = [self.cache[key] for key in keys]
+        while len(self.cache) > self.max_cache_entries:
+            del self.cache[next(iter(self.cache))]
+        return scores
+
+    def clear_cache(self):
+        self.cache = {}
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,53 +1,53 @@
 # genetic_algorithm.py
 
-import random
 import numpy as np
 
+from fitness import FitnessEvaluator, mill_difference
+from game import MorrisGame
+from population import Population
+
+# Board genomes store each square as an index into PIECES
+PIECES = (None, 'X', 'O')
+PIECE_CODES = {piece: code for code, piece in enumerate(PIECES)}
+
 class GeneticAlgorithm:
-    def __init__(self, population_size=100, mutation_rate=0.01, generations=100):
+    def __init__(self, population_size=100, mutation_rate=0.01, generations=100, evaluator=None,
+                 elite=2, tournament_size=3, crossover_method='one_point', seed=None):
         self.population_size = population_size
         self.mutation_rate = mutation_rate
         self.generations = generations
-        self.population = []
+        self.elite = elite
+        self.tournament_size = tournament_size
+        self.crossover_method = crossover_method  # 'one_point' or 'uniform'
+        self.rng = np.random.default_rng(seed)
+        self.population = None
+        self.template = MorrisGame()
+        # Scores whole generations; pass e.g. FitnessEvaluator(MatchFitness(), workers=None)
+        # to score by games against minimax in a process pool
+        self.evaluator = evaluator or FitnessEvaluator(mill_difference)
 
     def initialize_population(self, game):
-        self.population = [game.copy() for _ in range(self.population_size)]
+        self.template = game
+        genome = np.array([PIECE_CODES[piece] for piece in game.board], dtype=np.int8)
+        self.population = Population.from_genome(genome, self.population_size, np.arange(len(PIECES)),
+                                                 rng=self.rng)
+
+    def to_game(self, genome):
+        game = self.template.copy()
+        game.board = [PIECES[code] for code in genome.tolist()]
+        return game
 
     def fitness(self, game):
-        player_mills = game.count_mills('X')
-        opponent_mills = game.count_mills('O')
-        return player_mills - opponent_mills
-
-    def selection(self):
-        sorted_population = sorted(self.population, key=self.fitness, reverse=True)
-        return sorted_population[:self.population_size // 2]
-
-    def crossover(self, parent1, parent2):
-        child = parent1.copy()
-        crossover_point = random.randint(0, len(child.board) - 1)
-        child.board[crossover_point:] = parent2.board[crossover_point:]
-        return child
-
-    def mutate(self, game):
-        for i in range(len(game.board)):
-            if random.uniform(0, 1) < self.mutation_rate:
-                game.board[i] = random.choice(['X', 'O', None])
-        return game
+        return self.evaluator.evaluate([game])[0]
+
+    def scores(self):
+        return np.array(self.evaluator.evaluate([self.to_game(genome) for genome in self.population.genomes]))
 
     def evolve(self, game):
         self.initialize_population(game)
         for generation in range(self.generations):
-            selected_population = self.selection()
-            next_generation = []
-            for i in range(0, len(selected_population), 2):
-                parent1 = selected_population[i]
-                parent2 = selected_population[i + 1] if i + 1 < len(selected_population) else selected_population[0]
-                child1 = self.crossover(parent1, parent2)
-                child2 = self.crossover(parent2, parent1)
-                next_generation.append(self.mutate(child1))
-                next_generation.append(self.mutate(child2))
-            self.population = next_generation
-
-        best_game = max(self.population, key=self.fitness)
-        return best_game
+            self.population.next_generation(self.scores(), self.mutation_rate, self.elite, self.tournament_size,
+                                            self.crossover_method)
 
+        best_game = self.to_game(self.population.best(self.scores()))
+        return best_game
@@ -1,5 +1,15 @@
 # game.py
 
+MILLS = (
+    (0, 1, 2), (3, 4, 5), (6, 7, 8), (9, 10, 11),
+    (12, 13, 14), (15, 16, 17), (18, 19, 20), (21, 22, 23),
+    (0, 9, 21), (3, 10, 18), (6, 11, 15), (1, 4, 7),
+    (16, 19, 22), (8, 12, 17), (5, 13, 20), (2, 14, 23)
+)
+# Mills through each square (always two of them)
+SQUARE_MILLS = tuple(tuple(mill for mill in MILLS if i in mill) for i in range(24))
+
+
 class MorrisGame:
     def __init__(self):
         self.board = [None] * 24  # 24 positions on the board
@@ -9,6 +19,15 @@ class MorrisGame:
         self.moves_made = 0
         self.player_pieces = {'X': 12, 'O': 12}  # Each player has 12 pieces
 
+    def copy(self):
+        game = MorrisGame()
+        game.board = list(self.board)
+        game.current_player = self.current_player
+        game.phase = self.phase
+        game.moves_made = self.moves_made
+        game.player_pieces = dict(self.player_pieces)
+        return game
+
     def print_board(self):
         positions = [i if x is None else x for i, x in enumerate(self.board)]
         print(f"{positions[0]}-{positions[1]}-{positions[2]}   {positions[3]}-{positions[4]}-{positions[5]}")
@@ -58,16 +77,11 @@ class MorrisGame:
         return 'O' if self.current_player == 'X' else 'X'
 
     def check_mill(self, position):
-        mill_combinations = [
-            (0, 1, 2), (3, 4, 5), (6, 7, 8), (9, 10, 11),
-            (12, 13, 14), (15, 16, 17), (18, 19, 20), (21, 22, 23),
-            (0, 9, 21), (3, 10, 18), (6, 11, 15), (1, 4, 7),
-            (16, 19, 22), (8, 12, 17), (5, 13, 20), (2, 14, 23)
-        ]
-        for combo in mill_combinations:
-            if position in combo:
-                if self.board[combo[0]] == self.board[combo[1]] == self.board[combo[2]] == self.current_player:
-                    return True
+        board = self.board
+        player = self.current_player
+        for a, b, c in SQUARE_MILLS[position]:
+            if board[a] == board[b] == board[c] == player:
+                return True
         return False
 
     def switch_player(self):
@@ -119,15 +133,10 @@ class MorrisGame:
         return False
 
     def count_mills(self, player):
+        board = self.board
         mills = 0
-        mill_combinations = [
-            (0, 1, 2), (3, 4, 5), (6, 7, 8), (9, 10, 11),
-            (12, 13, 14), (15, 16, 17), (18, 19, 20), (21, 22, 23),
-            (0, 9, 21), (3, 10, 18), (6, 11, 15), (1, 4, 7),
-            (16, 19, 22), (8, 12, 17), (5, 13, 20), (2, 14, 23)
-        ]
-        for combo in mill_combinations:
-            if self.board[combo[0]] == self.board[combo[1]] == self.board[combo[2]] == player:
+        for a, b, c in MILLS:
+            if board[a] == board[b] == board[c] == player:
                 mills += 1
         return mills
 
@@ -0,0 +1,79 @@
+# population.py
+
+# A GA population held as one (size, genome length) NumPy matrix, with
+# selection, crossover and mutation done on the whole matrix at once.
+# Genomes are either discrete (each gene is one of gene_values, e.g. board
+# squares) or continuous (mutation adds Gaussian noise of mutation_scale).
+
+import numpy as np
+
+
+class Population:
+    def __init__(self, genomes, gene_values=None, mutation_scale=0.1, rng=None):
+        self.genomes = np.asarray(genomes)
+        self.gene_values = None if gene_values is None else np.asarray(gene_values, dtype=self.genomes.dtype)
+        self.mutation_scale = mutation_scale
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    @classmethod
+    def from_genome(cls, genome, size, gene_values=None, mutation_scale=0.1, rng=None):
+        # size copies of one genome
+        genome = np.asarray(genome)
+        return cls(np.tile(genome, (size, 1)), gene_values, mutation_scale, rng)
+
+    @classmethod
+    def random(cls, size, length, gene_values=None, low=-1.0, high=1.0, mutation_scale=0.1, rng=None):
+        rng = rng if rng is not None else np.random.default_rng()
+        if gene_values is not None:
+            genomes = rng.choice(np.asarray(gene_values), size=(size, length))
+        else:
+            genomes = rng.uniform(low, high, size=(size, length))
+        return cls(genomes, gene_values, mutation_scale, rng)
+
+    def __len__(self):
+        return len(self.genomes)
+
+    def tournament_select(self, scores, count, tournament_size=3):
+        # Indices of count tournament winners, each the best of tournament_size random entrants
+        entrants = self.rng.integers(0, len(self.genomes), size=(count, tournament_size))
+        winners = np.asarray(scores)[entrants].argmax(axis=1)
+        return entrants[np.arange(count), winners]
+
+    def crossover(self, first, second, method='uniform'):
+        # One child per row of first and second; 'uniform' takes each gene
+        # from either parent, 'one_point' takes a suffix from second
+        first, second = self.genomes[first], self.genomes[second]
+        count, length = first.shape
+        if method == 'uniform':
+            from_second = self.rng.random((count, length)) < 0.5
+        elif method == 'one_point':
+            points = self.rng.integers(0, length, size=count)
+            from_second = np.arange(length) >= points[:, None]
+        else:
+            raise ValueError(f"Unknown crossover method: {method}")
+        return np.where(from_second, second, first)
+
+    def mutate(self, genomes, rate):
+        # Each gene mutates independently with probability rate
+        mutated = self.rng.random(genomes.shape) < rate
+        if self.gene_values is not None:
+            replacements = self.rng.choice(self.gene_values, size=genomes.shape)
+        else:
+            replacements = genomes + self.rng.normal(0.0, self.mutation_scale, size=genomes.shape)
+        return np.where(mutated, replacements, genomes)
+
+    def next_generation(self, scores, mutation_rate, elite=0, tournament_size=3, method='uniform'):
+        # The elite best genomes survive unchanged; the rest are mutated
+        # children of tournament-selected parents
+        size = len(self.genomes)
+        elite = min(elite, size)
+        elites = self.genomes[np.argsort(scores, kind='stable')[::-1][:elite]]
+        count = size - elite
+        first = self.tournament_select(scores, count, tournament_size)
+        second = self.tournament_select(scores, count, tournament_size)
+        children = self.mutate(self.crossover(first, second, method), mutation_rate)
+        self.genomes = np.concatenate([elites, children.astype(self.genomes.dtype)])
+        return self.genomes
+
+    def best(self, scores):
+        return self.genomes[int(np.argmax(scores))]
@@ -0,0 +1,135 @@
+# weights_ga.py
+
+# Evolves the (pieces, mills, mobility) weights of MinimaxAlgorithm.evaluate_board.
+# A genome's fitness is its score over a few games of minimax against
+# minimax with the reference weights, played in the evaluator's process pool.
+# The best weights are saved where Q_learning/main.py loads them from.
+
+import argparse
+import os
+import random
+
+import numpy as np
+
+from fitness import Q_LEARNING_DIR, FitnessEvaluator
+from population import Population
+
+from bitboard_game import BitboardMorrisGame
+from minimax import DEFAULT_WEIGHTS, WEIGHTS_FILE, MinimaxAlgorithm, save_weights
+from transposition import TranspositionTable
+
+
+def genome_key(genome):
+    return genome.tobytes()
+
+
+class WeightTournamentFitness:
+    # The genome alternates between 'X' and 'O'. The first random_plies
+    # placements are random (seeded by the genome) so the games do not all
+    # repeat one line.
+
+    def __init__(self, games=4, depth=2, opponent_weights=DEFAULT_WEIGHTS, random_plies=4, max_plies=200, seed=0):
+        self.games = games
+        self.depth = depth
+        self.opponent_weights = tuple(opponent_weights)
+        self.random_plies = random_plies
+        self.max_plies = max_plies
+        self.seed = seed
+
+    def __call__(self, genome):
+        rng = random.Random(f"{self.seed}:{genome.tobytes().hex()}")
+        score = 0.0
+        for game_index in range(self.games):
+            genome_side = 'X' if game_index % 2 == 0 else 'O'
+            winner = self.play_game(tuple(genome.tolist()), genome_side, rng)
+            if winner == genome_side:
+                score += 1
+            elif winner == 'Draw':
+                score += 0.5
+        return score / self.games
+
+    def play_game(self, weights, genome_side, rng):
+        game = BitboardMorrisGame()
+        sides = {genome_side: weights, ('O' if genome_side == 'X' else 'X'): self.opponent_weights}
+        players = {side: MinimaxAlgorithm(game, TranspositionTable(max_entries=1 << 14), weights=side_weights)
+                   for side, side_weights in sides.items()}
+        for ply in range(self.max_plies):
+            if game.check_winner():
+                break
+            valid_moves = game.get_all_valid_moves()
+            if not valid_moves:
+                break
+            if ply < self.random_plies:
+                game.make_turn(rng.choice(game.turns()))
+            else:
+                game.make_turn(players[game.current_player].find_best_turn(self.depth))
+        winner = game.check_winner()
+        if winner:
+            return winner
+        difference = game.count_mills('X') - game.count_mills('O')
+        return 'X' if difference > 0 else 'O' if difference < 0 else 'Draw'
+
+
+class WeightsGA:
+    def __init__(self, population_size=20, mutation_rate=0.2, generations=10, evaluator=None, elite=2,
+                 tournament_size=3, mutation_scale=0.5, seed=None):
+        self.population_size = population_size
+        self.mutation_rate = mutation_rate
+        self.generations = generations
+        self.elite = elite
+        self.tournament_size = tournament_size
+        self.rng = np.random.default_rng(seed)
+        self.evaluator = evaluator or FitnessEvaluator(WeightTournamentFitness(), workers=None, key=genome_key)
+        self.population = None
+        # Spread of the mutation noise, and of the initial population on a log scale
+        self.mutation_scale = mutation_scale
+
+    def initialize_population(self, weights=DEFAULT_WEIGHTS):
+        # The reference weights plus variations of them
+        genomes = np.tile(np.array(weights, dtype=np.float64), (self.population_size, 1))
+        noise = self.rng.normal(0.0, self.mutation_scale, size=genomes.shape)
+        genomes[1:] *= np.exp(noise[1:])
+        self.population = Population(genomes, mutation_scale=self.mutation_scale, rng=self.rng)
+
+    def scores(self):
+        return np.array(self.evaluator.evaluate(list(self.population.genomes)))
+
+    def evolve(self, weights=DEFAULT_WEIGHTS, on_generation=None):
+        # Returns (best weights, their fitness); on_generation(generation, scores)
+        # is called after each generation is scored
+        self.initialize_population(weights)
+        for generation in range(self.generations):
+            scores = self.scores()
+            if on_generation is not None:
+                on_generation(generation, scores)
+            self.population.next_generation(scores, self.mutation_rate, self.elite, self.tournament_size, 'uniform')
+        scores = self.scores()
+        best = int(np.argmax(scores))
+        return tuple(self.population.genomes[best].tolist()), float(scores[best])
+
+
+def report_generation(generation, scores):
+    print(f"Generation {generation}: best {scores.max():.3f}, mean {scores.mean():.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evolve minimax evaluation weights')
+    parser.add_argument('--population', type=int, default=20)
+    parser.add_argument('--generations', type=int, default=10)
+    parser.add_argument('--games', type=int, default=4, help='games per fitness evaluation')
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=os.path.join(Q_LEARNING_DIR, WEIGHTS_FILE))
+    args = parser.parse_args()
+
+    fitness = WeightTournamentFitness(games=args.games, depth=args.depth, seed=args.seed)
+    with FitnessEvaluator(fitness, workers=args.workers, key=genome_key) as evaluator:
+        ga = WeightsGA(args.population, generations=args.generations, evaluator=evaluator, seed=args.seed)
+        weights, score = ga.evolve(on_generation=report_generation)
+    save_weights(weights, args.output, fitness=score, games=args.games, depth=args.depth)
+    print(f"Best weights {weights} (fitness {score:.3f}) saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# batch_env.py
+
+# Steps many games at once with NumPy. Boards are a (B, 24) int8 array with
+# 1 for 'X', -1 for 'O' and 0 for empty. Actions use the ids from board.py
+# (0-23 place on a square, 24+ move along a line). Unlike MorrisGame, each
+# step is a whole turn: a mill immediately removes an opponent piece and the
+# turn passes. Finished games are reset in place, so the batch never shrinks.
+
+import numpy as np
+
+from board import MILLS, MOVING_ACTIONS, NUM_ACTIONS, SQUARE_MILL_MASKS, BIT
+
+X, O = 1, -1
+
+MILL_INDEX = np.array(MILLS, dtype=np.intp)  # (16, 3)
+# The two mills through each square, as square indices: (24, 2, 3)
+SQUARE_MILL_INDEX = np.array([[[i for i in range(24) if mask & BIT[i]] for mask in SQUARE_MILL_MASKS[square]]
+                              for square in range(24)], dtype=np.intp)
+MOVE_FROM = np.array([from_pos for from_pos, _ in MOVING_ACTIONS], dtype=np.intp)
+MOVE_TO = np.array([to_pos for _, to_pos in MOVING_ACTIONS], dtype=np.intp)
+# Target square of every action id
+ACTION_TARGET = np.concatenate([np.arange(24, dtype=np.intp), MOVE_TO])
+SQUARE_BITS = (1 << np.arange(24, dtype=np.int64))
+
+
+class BatchMorrisEnv:
+    def __init__(self, batch_size, end_after_placing=True, max_plies=200, seed=None):
+        # end_after_placing mirrors MorrisGame.check_winner, which settles the
+        # game by mill count once all 24 pieces are placed. Otherwise play
+        # continues into the moving phase until a side has fewer than three
+        # pieces or no legal move, or max_plies is reached (a draw).
+        self.batch_size = batch_size
+        self.end_after_placing = end_after_placing
+        self.max_plies = max_plies
+        self.rng = np.random.default_rng(seed)
+        self.rows = np.arange(batch_size)
+        self.boards = np.zeros((batch_size, 24), dtype=np.int8)
+        self.current = np.full(batch_size, X, dtype=np.int8)
+        self.in_hand = np.full((batch_size, 2), 12, dtype=np.int8)  # column 0 'X', 1 'O'
+        self.moves_made = np.zeros(batch_size, dtype=np.int16)
+        self.plies = np.zeros(batch_size, dtype=np.int16)
+        self.games_finished = 0
+
+    def reset(self, which=None):
+        if which is None:
+            which = self.rows
+        self.boards[which] = 0
+        self.current[which] = X
+        self.in_hand[which] = 12
+        self.moves_made[which] = 0
+        self.plies[which] = 0
+        return self.boards
+
+    def player_column(self):
+        return (self.current == O).astype(np.intp)
+
+    def placing(self):
+        return self.in_hand[self.rows, self.player_column()] > 0
+
+    def legal_mask(self):
+        # (B, NUM_ACTIONS) bool of legal actions for the side to move
+        mask = np.zeros((self.batch_size, NUM_ACTIONS), dtype=bool)
+        placing = self.placing()
+        empty = self.boards == 0
+        mask[:, :24] = empty & placing[:, None]
+        own_from = self.boards[:, MOVE_FROM] == self.current[:, None]
+        mask[:, 24:] = own_from & empty[:, MOVE_TO] & ~placing[:, None]
+        return mask
+
+    def sample_actions(self, mask=None):
+        # Uniformly random legal action per game (0 where none is legal)
+        if mask is None:
+            mask = self.legal_mask()
+        scores = np.where(mask, self.rng.random(mask.shape), -1.0)
+        return scores.argmax(axis=1)
+
+    def count_mills(self, player):
+        return (self.boards[:, MILL_INDEX] == player).all(axis=2).sum(axis=1)
+
+    def position_codes(self):
+        # Same packing as board.encode_board, one int64 per game
+        x_bits = (self.boards == X).astype(np.int64) @ SQUARE_BITS
+        o_bits = (self.boards == O).astype(np.int64) @ SQUARE_BITS
+        return x_bits | o_bits << 24
+
+    def step(self, actions):
+        # Returns (boards, rewards, dones, winners). Rewards are from the point
+        # of view of the player who moved; winners are 1, -1, 0 (draw) for
+        # games that just finished. Finished games are already reset.
+        actions = np.asarray(actions, dtype=np.intp)
+        rows = self.rows
+        boards = self.boards
+        current = self.current
+        column = self.player_column()
+        placing = actions < 24
+
+        move_index = np.where(placing, 0, actions - 24)
+        from_squares = MOVE_FROM[move_index]
+        moving_rows = rows[~placing]
+        boards[moving_rows, from_squares[~placing]] = 0
+        targets = ACTION_TARGET[actions]
+        boards[rows, targets] = current
+        placing_rows = rows[placing]
+        self.in_hand[placing_rows, column[placing]] -= 1
+        self.moves_made[placing] += 1
+        self.plies += 1
+
+        mill_squares = boards[rows[:, None, None], SQUARE_MILL_INDEX[targets]]
+        formed = (mill_squares == current[:, None, None]).all(axis=2).any(axis=1)
+        self.remove_pieces(formed)
+
+        winners = np.zeros(self.batch_size, dtype=np.int8)
+        dones = np.zeros(self.batch_size, dtype=bool)
+        if self.end_after_placing:
+            settled = self.moves_made >= 24
+            x_mills, o_mills = self.count_mills(X), self.count_mills(O)
+            winners = np.where(settled, np.sign(x_mills - o_mills), 0).astype(np.int8)
+            dones |= settled
+        current *= -1
+        if not self.end_after_placing:
+            # The side now to move loses with fewer than three pieces (once
+            # it has nothing left to place) or with no legal action
+            pieces = (boards == current[:, None]).sum(axis=1)
+            in_hand = self.in_hand[rows, self.player_column()]
+            stuck = ~self.legal_mask().any(axis=1)
+            lost = ((pieces + in_hand) < 3) | stuck
+            winners = np.where(lost, -current, winners).astype(np.int8)
+            dones |= lost
+        dones |= self.plies >= self.max_plies
+
+        rewards = (winners * -current).astype(np.float32)  # -current is the player who just moved
+        finished = rows[dones]
+        if finished.size:
+            self.games_finished += finished.size
+            self.reset(finished)
+        return boards, rewards, dones, winners
+
+    def remove_pieces(self, formed):
+        # Each game that formed a mill removes one random opponent piece
+        rows = self.rows[formed]
+        if rows.size == 0:
+            return
+        opponent = -self.current[rows]
+        candidates = self.boards[rows] == opponent[:, None]
+        has_piece = candidates.any(axis=1)
+        scores = np.where(candidates, self.rng.random(candidates.shape), -1.0)
+        squares = scores.argmax(axis=1)
+        self.boards[rows[has_piece], squares[has_piece]] = 0
@@ -0,0 +1,228 @@
+# benchmark.py
+
+# Seeded performance scenarios for the engines, the search, Q-learning and
+# the GA, reported as JSON so runs can be compared:
+#
+#     python benchmark.py --output before.json
+#     python benchmark.py --baseline before.json
+#
+# Every scenario starts from the same positions and random streams for a
+# given --seed; rates are per second of wall-clock time.
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from bitboard_game import BitboardMorrisGame
+from game import MorrisGame
+from minimax import MinimaxAlgorithm
+from q_learning import QLearningAgent
+from search_stats import SearchStats
+
+ENGINES = {'reference': MorrisGame, 'bitboard': BitboardMorrisGame}
+# Random plies played from the start for each reference position. The game
+# ends once every piece is placed, so 'moving' is that final position: it still
+# has moving-phase moves to generate, make and undo, but nothing to search.
+POSITION_PLIES = {'placing_early': 4, 'placing_late': 16, 'moving': 40}
+Q_TABLE_SIZES = (1000, 100000)
+GA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Genetic Algorithm')
+
+GA_SCRIPT = '''
+import json, random, sys, time
+import numpy as np
+from ga import GeneticAlgorithm
+from game import MorrisGame
+random.seed({seed})
+ga = GeneticAlgorithm(population_size={population}, generations={generations}, seed={seed})
+start = time.perf_counter()
+ga.evolve(MorrisGame())
+elapsed = time.perf_counter() - start
+json.dump({{'generations': {generations}, 'seconds': elapsed, 'generations_per_second': {generations} / elapsed}}, sys.stdout)
+'''
+
+
+def reference_turns(seed):
+    # name -> seeded random sequence of packed turns, replayed to build each position on any engine
+    positions = {}
+    for name, plies in POSITION_PLIES.items():
+        rng = random.Random(f'{seed}:{name}')
+        game = BitboardMorrisGame()
+        turns = []
+        for _ in range(plies):
+            valid_turns = game.turns()
+            if not valid_turns or game.check_winner():
+                break
+            turn = rng.choice(valid_turns)
+            turns.append(turn)
+            game.make_turn(turn)
+        positions[name] = turns
+    return positions
+
+
+def build_position(engine, turns):
+    game = ENGINES[engine]()
+    for turn in turns:
+        game.make_turn(turn)
+    return game
+
+
+def timed(function, min_seconds):
+    # Runs function (which returns the number of operations it did) until
+    # min_seconds have passed; returns operations per second
+    operations = 0
+    start = time.perf_counter()
+    while True:
+        operations += function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return operations / elapsed
+
+
+def bench_make_undo(game, min_seconds):
+    turns = game.turns()
+
+    def cycle():
+        for turn in turns:
+            game.make_turn(turn)
+            game.unmake_turn()
+        return 2 * len(turns)
+
+    return timed(cycle, min_seconds)
+
+
+def bench_move_generation(game, min_seconds):
+    def calls():
+        for _ in range(100):
+            game.get_all_valid_moves()
+        return 100
+
+    return timed(calls, min_seconds)
+
+
+def bench_search(turns, max_depth, repeats=3):
+    # Best of repeats searches, each with fresh tables so no run reuses another's work
+    results = {}
+    for depth in range(1, max_depth + 1):
+        elapsed = float('inf')
+        for _ in range(repeats):
+            game = build_position('bitboard', turns)
+            minimax = MinimaxAlgorithm(game, stats=SearchStats())
+            start = time.perf_counter()
+            best_move = minimax.find_best_move(depth)
+            elapsed = min(elapsed, time.perf_counter() - start)
+        results[str(depth)] = {'seconds': elapsed, 'nodes': minimax.nodes,
+                               'nodes_per_second': minimax.nodes / elapsed if elapsed > 0 else 0.0,
+                               'best_move': best_move}
+    return results
+
+
+def bench_q_learning(backend, size, seed, min_seconds):
+    rng = random.Random(f'{seed}:{backend}:{size}')
+    game = BitboardMorrisGame()
+    agent = QLearningAgent(game, q_table_file=None, backend=backend)
+    states = []
+    for _ in range(max(1, size // 8)):
+        x_bits = rng.getrandbits(24)
+        states.append(agent.state_from_code(x_bits | (rng.getrandbits(24) & ~x_bits) << 24))
+    actions = list(range(24))
+    for i in range(size):
+        agent.set_q_value(states[i % len(states)], actions[i % 24], rng.random())
+    samples = [(rng.choice(states), rng.choice(actions)) for _ in range(1000)]
+    next_moves = actions[:8]
+
+    def lookups():
+        for state, action in samples:
+            agent.get_q_value(state, action)
+        return len(samples)
+
+    def updates():
+        for state, action in samples:
+            agent.update_q_value(state, action, 0.0, state, next_moves)
+        return len(samples)
+
+    return {'lookups_per_second': timed(lookups, min_seconds),
+            'updates_per_second': timed(updates, min_seconds),
+            'entries': len(agent.q_table)}
+
+
+def bench_ga(seed, population, generations):
+    script = GA_SCRIPT.format(seed=seed, population=population, generations=generations)
+    output = subprocess.run([sys.executable, '-c', script], cwd=GA_DIR, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout)
+
+
+def run(seed=0, max_depth=5, min_seconds=0.5, sections=None):
+    np.random.seed(seed)
+    positions = reference_turns(seed)
+    results = {}
+    sections = sections or ('engine', 'search', 'q_learning', 'ga')
+    if 'engine' in sections:
+        for engine in ENGINES:
+            for name, turns in positions.items():
+                game = build_position(engine, turns)
+                results[f'make_undo/{engine}/{name}'] = {
+                    'ops_per_second': bench_make_undo(game, min_seconds)}
+                results[f'move_generation/{engine}/{name}'] = {
+                    'calls_per_second': bench_move_generation(build_position(engine, turns), min_seconds)}
+    if 'search' in sections:
+        for name, turns in positions.items():
+            if build_position('bitboard', turns).check_winner():
+                continue
+            for depth, result in bench_search(turns, max_depth).items():
+                results[f'search/{name}/depth{depth}'] = result
+    if 'q_learning' in sections:
+        for backend in ('dict', 'compact', 'dense'):
+            for size in Q_TABLE_SIZES:
+                results[f'q_learning/{backend}/{size}'] = bench_q_learning(backend, size, seed, min_seconds)
+    if 'ga' in sections:
+        results['ga/evolve'] = bench_ga(seed, population=100, generations=20)
+    return {'meta': {'seed': seed, 'max_depth': max_depth, 'python': platform.python_version(),
+                     'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'results': results}
+
+
+def compare(report, baseline):
+    # Prints the ratio of every rate (higher is better) or time (lower is better) to the baseline
+    for name, result in report['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        for metric, value in result.items():
+            if not isinstance(value, (int, float)) or not isinstance(old.get(metric), (int, float)) \
+                    or not old[metric] or metric in ('nodes', 'entries', 'generations'):
+                continue
+            ratio = value / old[metric]
+            print(f"{name:45} {metric:24} {old[metric]:14.4g} -> {value:14.4g}  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for 12 Men's Morris")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-depth', type=int, default=5)
+    parser.add_argument('--min-seconds', type=float, default=0.5, help='minimum run time of each rate measurement')
+    parser.add_argument('--sections', nargs='+', choices=['engine', 'search', 'q_learning', 'ga'])
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    args = parser.parse_args()
+
+    report = run(args.seed, args.max_depth, args.min_seconds, args.sections)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+# bitboard_game.py
+
+from board import (BIT, FULL_MASK, MILL_MASKS, NEIGHBOUR_MASKS, NO_CAPTURE, NO_SQUARE, SQUARE_MILL_MASKS,
+                   UNDO_STACK_SIZE, ZOBRIST, ZOBRIST_IN_HAND, ZOBRIST_MOVING, ZOBRIST_SIDE, squares, zobrist_hash)
+
+
+class BitboardMorrisGame:
+    # Drop-in replacement for MorrisGame that keeps one 24-bit integer per
+    # player instead of a list of 'X'/'O'/None. Moves in the moving phase follow
+    # the board lines, and undo_move reverts the last successful make_move
+    # exactly (player, phase, piece counts and any capture made after it).
+
+    def __init__(self):
+        self.bitboards = {'X': 0, 'O': 0}
+        self.players = ['X', 'O']
+        self.current_player = 'X'
+        self.phase = 'placing'  # 'placing', 'moving'
+        self.moves_made = 0
+        self.player_pieces = {'X': 12, 'O': 12}  # Pieces still to be placed
+        self.mobility = {'X': 0, 'O': 0}  # Moving-phase moves available to each player
+        self.hash = zobrist_hash(self.board, self.current_player, self.phase, self.player_pieces)
+        # One record per make_move not yet undone: [x, o, player, phase, moves made, 'X' in hand,
+        # 'O' in hand, 'X' mobility, 'O' mobility, hash], written in place
+        self.undo_stack = [[None] * 10 for _ in range(UNDO_STACK_SIZE)]
+        self.undo_top = 0
+
+    @classmethod
+    def from_board(cls, board, current_player='X', phase='placing', moves_made=None, player_pieces=None):
+        game = cls()
+        for i, piece in enumerate(board):
+            if piece is not None:
+                game.bitboards[piece] |= BIT[i]
+        game.current_player = current_player
+        game.phase = phase
+        if moves_made is None:
+            moves_made = sum(1 for piece in board if piece is not None)
+        game.moves_made = moves_made
+        if player_pieces is not None:
+            game.player_pieces = dict(player_pieces)
+        game.recount_mobility()
+        game.hash = zobrist_hash(board, game.current_player, game.phase, game.player_pieces)
+        return game
+
+    @classmethod
+    def from_game(cls, game):
+        return cls.from_board(game.board, game.current_player, game.phase, game.moves_made, game.player_pieces)
+
+    def copy(self):
+        game = BitboardMorrisGame()
+        game.bitboards = dict(self.bitboards)
+        game.current_player = self.current_player
+        game.phase = self.phase
+        game.moves_made = self.moves_made
+        game.player_pieces = dict(self.player_pieces)
+        game.mobility = dict(self.mobility)
+        game.hash = self.hash
+        return game
+
+    @property
+    def board(self):
+        x, o = self.bitboards['X'], self.bitboards['O']
+        return ['X' if x >> i & 1 else 'O' if o >> i & 1 else None for i in range(24)]
+
+    def print_board(self):
+        positions = [i if x is None else x for i, x in enumerate(self.board)]
+        print(f"{positions[0]}-{positions[1]}-{positions[2]}   {positions[3]}-{positions[4]}-{positions[5]}")
+        print(f"| \\ | / |   | \\ | / |")
+        print(f"{positions[6]}-{positions[7]}-{positions[8]}   {positions[9]}-{positions[10]}-{positions[11]}")
+        print(f"| / | \\ |   | / | \\ |")
+        print(f"{positions[12]}-{positions[13]}-{positions[14]}   {positions[15]}-{positions[16]}-{positions[17]}")
+        print(f"{positions[18]}-{positions[19]}-{positions[20]}   {positions[21]}-{positions[22]}-{positions[23]}")
+
+    def empty_mask(self):
+        return ~(self.bitboards['X'] | self.bitboards['O']) & FULL_MASK
+
+    def is_valid_move(self, position):
+        return not (self.bitboards['X'] | self.bitboards['O']) & BIT[position]
+
+    def is_valid_move_moving_phase(self, from_pos, to_pos):
+        return bool(self.bitboards[self.current_player] & BIT[from_pos]
+                    and NEIGHBOUR_MASKS[from_pos] & self.empty_mask() & BIT[to_pos])
+
+    def recount_mobility(self):
+        empty = self.empty_mask()
+        for player in self.players:
+            self.mobility[player] = sum((NEIGHBOUR_MASKS[i] & empty).bit_count()
+                                        for i in squares(self.bitboards[player]))
+
+    def _drop(self, position, player):
+        # Occupy an empty square, keeping the mobility counts in step
+        bitboards = self.bitboards
+        mobility = self.mobility
+        x, o = bitboards['X'], bitboards['O']
+        neighbours = NEIGHBOUR_MASKS[position]
+        mobility[player] += (neighbours & ~(x | o)).bit_count()
+        mobility['X'] -= (neighbours & x).bit_count()
+        mobility['O'] -= (neighbours & o).bit_count()
+        bitboards[player] |= BIT[position]
+        self.hash ^= ZOBRIST[player][position]
+
+    def _lift(self, position, player):
+        bitboards = self.bitboards
+        mobility = self.mobility
+        bitboards[player] ^= BIT[position]
+        self.hash ^= ZOBRIST[player][position]
+        x, o = bitboards['X'], bitboards['O']
+        neighbours = NEIGHBOUR_MASKS[position]
+        mobility[player] -= (neighbours & ~(x | o)).bit_count()
+        mobility['X'] += (neighbours & x).bit_count()
+        mobility['O'] += (neighbours & o).bit_count()
+
+    def push_undo(self):
+        if self.undo_top == len(self.undo_stack):
+            self.undo_stack.append([None] * 10)
+        bitboards, pieces, mobility = self.bitboards, self.player_pieces, self.mobility
+        self.undo_stack[self.undo_top][:] = (bitboards['X'], bitboards['O'], self.current_player, self.phase,
+                                             self.moves_made, pieces['X'], pieces['O'], mobility['X'],
+                                             mobility['O'], self.hash)
+        self.undo_top += 1
+
+    def make_move(self, from_pos, to_pos=None):
+        bitboards = self.bitboards
+        pieces = self.player_pieces
+        mobility = self.mobility
+        player = self.current_player
+        x, o = bitboards['X'], bitboards['O']
+        if self.phase == 'placing':
+            if not (x | o) & BIT[from_pos]:
+                self.push_undo()
+                self._drop(from_pos, player)
+                in_hand = pieces[player]
+                self.hash ^= ZOBRIST_IN_HAND[player][in_hand] ^ ZOBRIST_IN_HAND[player][in_hand - 1]
+                pieces[player] = in_hand - 1
+                self.moves_made += 1
+                # Moving starts once both players have placed every piece
+                if not pieces['X'] and not pieces['O']:
+                    self.phase = 'moving'
+                    self.hash ^= ZOBRIST_MOVING
+                if self.check_mill(from_pos):
+                    return 'mill'
+                self.current_player = 'O' if player == 'X' else 'X'
+                self.hash ^= ZOBRIST_SIDE
+                return True
+        elif self.phase == 'moving':
+            if bitboards[player] & BIT[from_pos] and NEIGHBOUR_MASKS[from_pos] & ~(x | o) & BIT[to_pos]:
+                self.push_undo()
+                self._lift(from_pos, player)
+                self._drop(to_pos, player)
+                if self.check_mill(to_pos):
+                    return 'mill'
+                self.current_player = 'O' if player == 'X' else 'X'
+                self.hash ^= ZOBRIST_SIDE
+                return True
+        return False
+
+    def remove_opponent_piece(self, position):
+        opponent = self.get_opponent()
+        if self.bitboards[opponent] & BIT[position]:
+            self._lift(position, opponent)
+            return True
+        return False
+
+    def get_opponent(self):
+        return 'O' if self.current_player == 'X' else 'X'
+
+    def check_mill(self, position):
+        bitboard = self.bitboards[self.current_player]
+        for mask in SQUARE_MILL_MASKS[position]:
+            if bitboard & mask == mask:
+                return True
+        return False
+
+    def forms_mill(self, from_pos, to_pos=None):
+        # Whether the move would close a mill for the current player, without making it
+        bitboard = self.bitboards[self.current_player]
+        if to_pos is None:
+            target = from_pos
+        else:
+            target = to_pos
+            bitboard &= ~BIT[from_pos]
+        bitboard |= BIT[target]
+        for mask in SQUARE_MILL_MASKS[target]:
+            if bitboard & mask == mask:
+                return True
+        return False
+
+    def switch_player(self):
+        self.current_player = 'O' if self.current_player == 'X' else 'X'
+        self.hash ^= ZOBRIST_SIDE
+
+    def get_all_valid_moves(self):
+        return self.get_all_valid_moves_for_player(self.current_player)
+
+    def get_all_valid_moves_for_player(self, player):
+        empty = self.empty_mask()
+        if self.phase == 'placing':
+            return list(squares(empty))
+        elif self.phase == 'moving':
+            return [(from_pos, to_pos)
+                    for from_pos in squares(self.bitboards[player])
+                    for to_pos in squares(NEIGHBOUR_MASKS[from_pos] & empty)]
+
+    def iter_moves(self, player=None):
+        # The masks are read once up front, so the caller may make and undo
+        # moves between items
+        empty = self.empty_mask()
+        if self.phase == 'placing':
+            yield from squares(empty)
+        elif self.phase == 'moving':
+            if player is None:
+                player = self.current_player
+            for from_pos in squares(self.bitboards[player]):
+                for to_pos in squares(NEIGHBOUR_MASKS[from_pos] & empty):
+                    yield (from_pos, to_pos)
+
+    def generate_moves(self, buffer, player=None):
+        # Fills a caller-owned list instead of allocating a new one
+        buffer.clear()
+        buffer.extend(self.iter_moves(player))
+        return len(buffer)
+
+    def count_valid_moves_for_player(self, player):
+        if self.phase == 'placing':
+            return 24 - (self.bitboards['X'] | self.bitboards['O']).bit_count()
+        return self.mobility[player]
+
+    def undo_move(self, from_pos=None, to_pos=None):
+        if not self.undo_top:
+            return
+        self.undo_top -= 1
+        (x, o, self.current_player, self.phase, self.moves_made,
+         x_pieces, o_pieces, x_mobility, o_mobility, self.hash) = self.undo_stack[self.undo_top]
+        self.bitboards['X'] = x
+        self.bitboards['O'] = o
+        self.player_pieces['X'] = x_pieces
+        self.player_pieces['O'] = o_pieces
+        self.mobility['X'] = x_mobility
+        self.mobility['O'] = o_mobility
+
+    def turns(self):
+        # Every legal turn packed as in board.pack_turn, a mill-closing move once per capture
+        targets = squares(self.bitboards[self.get_opponent()])
+        turns = []
+        forms_mill = self.forms_mill
+        if self.phase == 'placing':
+            for to_pos in squares(self.empty_mask()):
+                turn = to_pos | NO_SQUARE << 5
+                if targets and forms_mill(to_pos):
+                    turns.extend(turn | target << 10 for target in targets)
+                else:
+                    turns.append(turn | NO_CAPTURE)
+        elif self.phase == 'moving':
+            empty = self.empty_mask()
+            for from_pos in squares(self.bitboards[self.current_player]):
+                for to_pos in squares(NEIGHBOUR_MASKS[from_pos] & empty):
+                    turn = to_pos | from_pos << 5
+                    if targets and forms_mill(from_pos, to_pos):
+                        turns.extend(turn | target << 10 for target in targets)
+                    else:
+                        turns.append(turn | NO_CAPTURE)
+        return turns
+
+    def make_turn(self, turn):
+        # Makes a packed turn, capture included, and passes the turn on
+        to_pos, from_pos, captured = turn & 31, turn >> 5 & 31, turn >> 10
+        if from_pos == NO_SQUARE:
+            result = self.make_move(to_pos)
+        else:
+            result = self.make_move(from_pos, to_pos)
+        if result == 'mill':
+            if captured != NO_SQUARE:
+                self.remove_opponent_piece(captured)
+            self.switch_player()
+        return result
+
+    def unmake_turn(self):
+        # The whole turn is one undo record, since the record holds both bitboards
+        self.undo_move()
+
+    def check_winner(self):
+        if self.moves_made == 24:  # All pieces have been placed
+            player_mills = self.count_mills('X')
+            opponent_mills = self.count_mills('O')
+            if player_mills > opponent_mills:
+                return 'X'
+            elif opponent_mills > player_mills:
+                return 'O'
+            else:
+                return 'Draw'
+        return False
+
+    def position_code(self):
+        # Same packing as board.encode_board
+        return self.bitboards['X'] | self.bitboards['O'] << 24
+
+    def count_pieces(self, player):
+        return self.bitboards[player].bit_count()
+
+    def count_mills(self, player):
+        bitboard = self.bitboards[player]
+        mills = 0
+        for mask in MILL_MASKS:
+            if bitboard & mask == mask:
+                mills += 1
+        return mills
@@ -0,0 +1,135 @@
+# board.py
+
+import random
+
+# Board geometry shared by the game engines. Squares are numbered 0-23 in the
+# same order as the buttons laid out by MorrisApp.setup_board.
+
+MILLS = (
+    (0, 1, 2), (3, 4, 5), (6, 7, 8), (9, 10, 11),
+    (12, 13, 14), (15, 16, 17), (18, 19, 20), (21, 22, 23),
+    (0, 9, 21), (3, 10, 18), (6, 11, 15), (1, 4, 7),
+    (16, 19, 22), (8, 12, 17), (5, 13, 20), (2, 14, 23)
+)
+
+# (row, column) of each square on the 7x7 grid used by MorrisApp.setup_board
+COORDINATES = (
+    (0, 0), (0, 3), (0, 6),
+    (1, 1), (1, 3), (1, 5),
+    (2, 2), (2, 3), (2, 4),
+    (3, 0), (3, 1), (3, 2), (3, 4), (3, 5), (3, 6),
+    (4, 2), (4, 3), (4, 4),
+    (5, 1), (5, 3), (5, 5),
+    (6, 0), (6, 3), (6, 6)
+)
+
+# Mills through each square (always two of them)
+SQUARE_MILLS = tuple(tuple(mill for mill in MILLS if i in mill) for i in range(24))
+
+# 12 Men's Morris adds the corner diagonals to the usual lines
+DIAGONALS = ((0, 3), (3, 6), (2, 5), (5, 8), (15, 18), (18, 21), (17, 20), (20, 23))
+
+
+def _build_adjacency():
+    neighbours = [set() for _ in range(24)]
+    edges = [(a, b) for a, b, _ in MILLS] + [(b, c) for _, b, c in MILLS] + list(DIAGONALS)
+    for a, b in edges:
+        neighbours[a].add(b)
+        neighbours[b].add(a)
+    return tuple(tuple(sorted(n)) for n in neighbours)
+
+
+ADJACENCY = _build_adjacency()
+
+BIT = tuple(1 << i for i in range(24))
+FULL_MASK = (1 << 24) - 1
+
+MILL_MASKS = tuple(BIT[a] | BIT[b] | BIT[c] for a, b, c in MILLS)
+# Mill masks passing through each square (always two of them)
+SQUARE_MILL_MASKS = tuple(tuple(m for m in MILL_MASKS if m & BIT[i]) for i in range(24))
+NEIGHBOUR_MASKS = tuple(sum(BIT[n] for n in ADJACENCY[i]) for i in range(24))
+
+# Lookup tables turning a 12-bit half of a mask into the squares it contains
+_LOW_SQUARES = tuple(tuple(i for i in range(12) if m >> i & 1) for m in range(1 << 12))
+_HIGH_SQUARES = tuple(tuple(i + 12 for i in s) for s in _LOW_SQUARES)
+
+
+def squares(mask):
+    return _LOW_SQUARES[mask & 0xFFF] + _HIGH_SQUARES[mask >> 12]
+
+# Zobrist keys: one per (player, square), per (player, pieces in hand), for
+# the side to move and for the moving phase. Seeded so hashes are stable
+# between runs and processes.
+_zobrist_random = random.Random(12)
+ZOBRIST = {player: tuple(_zobrist_random.getrandbits(64) for _ in range(24)) for player in ('X', 'O')}
+ZOBRIST_IN_HAND = {player: tuple(_zobrist_random.getrandbits(64) for _ in range(13)) for player in ('X', 'O')}
+ZOBRIST_SIDE = _zobrist_random.getrandbits(64)  # Set while 'O' is to move
+ZOBRIST_MOVING = _zobrist_random.getrandbits(64)
+
+
+def zobrist_hash(board, current_player, phase, player_pieces):
+    h = 0
+    for i, piece in enumerate(board):
+        if piece is not None:
+            h ^= ZOBRIST[piece][i]
+    for player in ('X', 'O'):
+        h ^= ZOBRIST_IN_HAND[player][player_pieces[player]]
+    if current_player == 'O':
+        h ^= ZOBRIST_SIDE
+    if phase == 'moving':
+        h ^= ZOBRIST_MOVING
+    return h
+
+# Actions as small ints: placing on square i is i, moving along a line is
+# 24 + its index in MOVING_ACTIONS
+MOVING_ACTIONS = tuple((from_pos, to_pos) for from_pos in range(24) for to_pos in ADJACENCY[from_pos])
+NUM_ACTIONS = 24 + len(MOVING_ACTIONS)
+ACTION_IDS = {move: 24 + i for i, move in enumerate(MOVING_ACTIONS)}
+ACTION_IDS.update({i: i for i in range(24)})
+ACTIONS = tuple(range(24)) + MOVING_ACTIONS
+
+
+def encode_board(board):
+    # Packs a board list into one int: 'X' bitboard in the low 24 bits, 'O' above it
+    code = 0
+    for i, piece in enumerate(board):
+        if piece == 'X':
+            code |= BIT[i]
+        elif piece == 'O':
+            code |= BIT[i] << 24
+    return code
+
+
+def decode_board(code):
+    return ['X' if code >> i & 1 else 'O' if code >> (i + 24) & 1 else None for i in range(24)]
+
+# Whole turns packed into one int for the search: the square moved to in
+# bits 0-4, the square moved from in bits 5-9 (NO_SQUARE when placing) and
+# the captured square in bits 10-14 (NO_SQUARE when the move closes no mill)
+NO_SQUARE = 31
+NO_CAPTURE = NO_SQUARE << 10
+
+# Undo records each engine allocates up front; the stack grows past this if needed
+UNDO_STACK_SIZE = 256
+
+
+def pack_turn(move, captured=None):
+    if isinstance(move, int):
+        turn = move | NO_SQUARE << 5
+    else:
+        turn = move[1] | move[0] << 5
+    return turn | (NO_SQUARE if captured is None else captured) << 10
+
+
+def unpack_turn(turn):
+    # Returns (move, captured square or None), move as get_all_valid_moves gives it
+    to_pos, from_pos, captured = turn & 31, turn >> 5 & 31, turn >> 10
+    move = to_pos if from_pos == NO_SQUARE else (from_pos, to_pos)
+    return move, None if captured == NO_SQUARE else captured
+
+
+def turn_for_move(turns, move, rng=random):
+    # One of the turns that plays move (as get_all_valid_moves gives it), with
+    # a random capture when it closes a mill; None when none of them does
+    matching = [turn for turn in turns if unpack_turn(turn)[0] == move]
+    return rng.choice(matching) if matching else None
@@ -0,0 +1,309 @@
+# endgame_db.py
+
+# Retrograde win/draw/loss database for moving-phase positions with at most
+# max_pieces pieces per side on the board and none left to place for either
+# side; probe returns None for anything else. The database plays by its own
+# rules below and ignores MorrisGame.check_winner, so callers score finished
+# games themselves before probing. Positions are seen from the side to move
+# ("mover"): a move slides a piece along a line, a new mill removes any one
+# opponent piece, a side with fewer than three pieces or no legal move has
+# lost. There is one partition per (mover pieces, opponent pieces); the
+# position with mover squares M and opponent squares O sits at
+#     rank(M) * comb(24, opponent pieces) + rank(O)
+# where rank is the colex rank of a square set. Overlapping M and O leave
+# unused entries, which wastes some space but keeps indexing to two table
+# lookups. Each partition is an int16 .npy file, memory-mapped when probing:
+#     0   draw
+#     d   mover wins in d plies
+#     -d  mover loses in d - 1 plies (-1: already lost)
+#
+# Partitions are built in order of total pieces, each together with its
+# colour-swapped twin. Successor lists are streamed to disk block by block,
+# then resolved in synchronous rounds: round r settles exactly the positions
+# whose result is r plies away, so the distances are exact.
+#
+#     python endgame_db.py --max-pieces 3
+#
+# Under the current MorrisGame.check_winner rules the probe never answers in
+# real play: a game only reaches the moving phase once all 24 pieces are
+# placed, and check_winner has already ended it there, so minimax scores the
+# result before it would probe. Only positions set up with from_board reach
+# the database, which is why nothing loads it by default (game_server.py
+# takes --endgame to opt in).
+
+import argparse
+import os
+import tempfile
+import time
+from itertools import combinations
+from math import comb
+
+import numpy as np
+
+from board import MOVING_ACTIONS, SQUARE_MILL_MASKS
+
+DATABASE_DIR = 'endgame'
+MIN_PIECES = 3
+# Positions per block when generating successors
+BLOCK_POSITIONS = 1 << 18
+
+# Colex rank of a 24-bit square set in two lookups: the low 12 bits give a
+# partial rank and a count, which selects the table for the high 12 bits
+_LOW_RANK = np.zeros(1 << 12, dtype=np.int64)
+_LOW_COUNT = np.zeros(1 << 12, dtype=np.int64)
+_HIGH_RANK = np.zeros((13, 1 << 12), dtype=np.int64)
+for _bits in range(1 << 12):
+    _squares = [i for i in range(12) if _bits >> i & 1]
+    _LOW_RANK[_bits] = sum(comb(square, j + 1) for j, square in enumerate(_squares))
+    _LOW_COUNT[_bits] = len(_squares)
+    for _below in range(13):
+        _HIGH_RANK[_below, _bits] = sum(comb(square + 12, _below + j + 1) for j, square in enumerate(_squares))
+
+MOVE_FROM_BITS = np.array([1 << from_pos for from_pos, _ in MOVING_ACTIONS], dtype=np.int64)
+MOVE_TO = [to_pos for _, to_pos in MOVING_ACTIONS]
+
+
+def rank(masks):
+    low = masks & 0xFFF
+    return _LOW_RANK[low] + _HIGH_RANK[_LOW_COUNT[low], masks >> 12]
+
+
+def square_sets(pieces):
+    # Every set of that many squares, as bit masks in rank order
+    masks = np.zeros(comb(24, pieces), dtype=np.int64)
+    for combination_index, squares in enumerate(combinations(range(24), pieces)):
+        masks[combination_index] = sum(1 << square for square in squares)
+    return masks[np.argsort(rank(masks))]
+
+
+def partition_file(directory, mover, opponent):
+    return os.path.join(directory, f'm{mover}_o{opponent}.npy')
+
+
+def partition_size(mover, opponent):
+    return comb(24, mover) * comb(24, opponent)
+
+
+def encode_result(won, distance):
+    return distance if won else -(distance + 1)
+
+
+class EndgameDatabase:
+    def __init__(self, directory=DATABASE_DIR, max_pieces=None):
+        self.directory = directory
+        self.partitions = {}
+        if max_pieces is None:
+            max_pieces = MIN_PIECES - 1
+            while os.path.exists(partition_file(directory, max_pieces + 1, max_pieces + 1)):
+                max_pieces += 1
+        self.max_pieces = max_pieces
+        self.hits = 0
+
+    def partition(self, mover, opponent):
+        key = (mover, opponent)
+        if key not in self.partitions:
+            self.partitions[key] = np.load(partition_file(self.directory, mover, opponent), mmap_mode='r')
+        return self.partitions[key]
+
+    def lookup(self, mover_mask, opponent_mask):
+        # Raw stored value for the mover (see the table at the top), or None
+        mover = mover_mask.bit_count()
+        opponent = opponent_mask.bit_count()
+        if not MIN_PIECES <= mover <= self.max_pieces or not MIN_PIECES <= opponent <= self.max_pieces:
+            return None
+        index = int(rank(np.int64(mover_mask))) * comb(24, opponent) + int(rank(np.int64(opponent_mask)))
+        self.hits += 1
+        return int(self.partition(mover, opponent)[index])
+
+    def probe(self, game):
+        # (result, plies) for the side to move in a moving-phase game, with
+        # result 1 win, 0 draw, -1 loss; None if the position is not covered
+        if game.phase != 'moving' or game.player_pieces['X'] or game.player_pieces['O']:
+            return None
+        code = game.position_code()
+        x_mask, o_mask = code & 0xFFFFFF, code >> 24
+        if game.current_player == 'X':
+            value = self.lookup(x_mask, o_mask)
+        else:
+            value = self.lookup(o_mask, x_mask)
+        if value is None:
+            return None
+        if value > 0:
+            return 1, value
+        if value < 0:
+            return -1, -value - 1
+        return 0, 0
+
+
+def load_endgame(directory=DATABASE_DIR):
+    # None when no database has been built
+    if not os.path.exists(partition_file(directory, MIN_PIECES, MIN_PIECES)):
+        return None
+    return EndgameDatabase(directory)
+
+
+class PartitionBuilder:
+    # Solves partitions (a, b) and (b, a) together, since a move in one leads
+    # to the other; captures lead to already solved smaller partitions
+
+    def __init__(self, directory, mover, opponent, work_dir):
+        self.directory = directory
+        self.work_dir = work_dir
+        self.pairs = [(mover, opponent)] if mover == opponent else [(mover, opponent), (opponent, mover)]
+        self.offsets = {}
+        offset = 0
+        for pair in self.pairs:
+            self.offsets[pair] = offset
+            offset += partition_size(*pair)
+        self.values = np.zeros(offset, dtype=np.int16)
+        self.valid = np.zeros(offset, dtype=bool)
+        self.blocks = []  # (first position, last position + 1, successor file prefix, successor count)
+        self.max_fixed_distance = 0
+        self.solved = {}
+
+    def solved_value(self, mover, opponent, mover_masks, opponent_masks):
+        # Values in an already built partition; a side left with two pieces has lost
+        if mover < MIN_PIECES:
+            return np.full(len(mover_masks), encode_result(False, 0), dtype=np.int16)
+        if (mover, opponent) not in self.solved:
+            self.solved[(mover, opponent)] = np.load(partition_file(self.directory, mover, opponent), mmap_mode='r')
+        table = self.solved[(mover, opponent)]
+        return np.asarray(table[rank(mover_masks) * comb(24, opponent) + rank(opponent_masks)])
+
+    def generate(self):
+        for pair in self.pairs:
+            mover, opponent = pair
+            mover_sets = square_sets(mover)
+            opponent_sets = square_sets(opponent)
+            rows_per_block = max(1, BLOCK_POSITIONS // len(opponent_sets))
+            for first_row in range(0, len(mover_sets), rows_per_block):
+                rows = mover_sets[first_row:first_row + rows_per_block]
+                mover_masks = np.repeat(rows, len(opponent_sets))
+                opponent_masks = np.tile(opponent_sets, len(rows))
+                start = self.offsets[pair] + first_row * len(opponent_sets)
+                self.generate_block(pair, start, mover_masks, opponent_masks)
+
+    def generate_block(self, pair, start, mover_masks, opponent_masks):
+        mover, opponent = pair
+        count = len(mover_masks)
+        valid = (mover_masks & opponent_masks) == 0
+        self.valid[start:start + count] = valid
+        occupied = mover_masks | opponent_masks
+        sources, targets, fixed = [], [], []
+        for action, (from_bit, to_pos) in enumerate(zip(MOVE_FROM_BITS.tolist(), MOVE_TO)):
+            to_bit = 1 << to_pos
+            rows = np.flatnonzero(valid & (mover_masks & from_bit != 0) & (occupied & to_bit == 0))
+            if not rows.size:
+                continue
+            moved = mover_masks[rows] ^ from_bit ^ to_bit
+            other = opponent_masks[rows]
+            mill = np.zeros(rows.size, dtype=bool)
+            for mill_mask in SQUARE_MILL_MASKS[to_pos]:
+                mill |= (moved & mill_mask) == mill_mask
+            quiet = ~mill
+            # The opponent moves next, with the squares swapped round
+            successor = self.offsets[(opponent, mover)] + rank(other[quiet]) * comb(24, mover) + rank(moved[quiet])
+            sources.append(rows[quiet])
+            targets.append(successor)
+            fixed.append(np.zeros(successor.size, dtype=np.int16))
+            for capture in range(24):
+                capture_bit = 1 << capture
+                taken = np.flatnonzero(mill & (other & capture_bit != 0))
+                if not taken.size:
+                    continue
+                value = self.solved_value(opponent - 1, mover, other[taken] ^ capture_bit, moved[taken])
+                self.max_fixed_distance = max(self.max_fixed_distance, int(np.abs(value).max()))
+                sources.append(rows[taken])
+                targets.append(np.full(taken.size, -1, dtype=np.int64))
+                fixed.append(value)
+        if sources:
+            sources = np.concatenate(sources)
+            order = np.argsort(sources, kind='stable')
+            sources = (sources[order] + start).astype(np.int32)
+            targets = np.concatenate(targets)[order].astype(np.int32)
+            fixed = np.concatenate(fixed)[order]
+        else:
+            sources = targets = np.zeros(0, dtype=np.int32)
+            fixed = np.zeros(0, dtype=np.int16)
+        prefix = os.path.join(self.work_dir, f'block{len(self.blocks)}')
+        sources.tofile(prefix + '.sources')
+        targets.tofile(prefix + '.targets')
+        fixed.tofile(prefix + '.fixed')
+        self.blocks.append((start, start + count, prefix, len(sources)))
+        # Stuck positions are lost already
+        has_move = np.zeros(count, dtype=bool)
+        has_move[sources - start] = True
+        self.values[start:start + count][valid & ~has_move] = encode_result(False, 0)
+
+    def solve(self):
+        # Round r settles the positions exactly r plies from their result
+        round_number = 1
+        while True:
+            changed = 0
+            updates = []
+            for start, end, prefix, size in self.blocks:
+                if size == 0:
+                    continue
+                sources = np.fromfile(prefix + '.sources', dtype=np.int32, count=size)
+                targets = np.fromfile(prefix + '.targets', dtype=np.int32, count=size)
+                fixed = np.fromfile(prefix + '.fixed', dtype=np.int16, count=size)
+                successor = np.where(targets >= 0, self.values[np.maximum(targets, 0)], fixed).astype(np.int32)
+                segment_starts = np.concatenate(([0], np.flatnonzero(np.diff(sources)) + 1))
+                positions = sources[segment_starts]
+                # Win: reach a position the opponent loses, as fast as possible
+                win_distance = np.minimum.reduceat(np.where(successor < 0, -successor, 1 << 30), segment_starts)
+                # Loss: every move reaches a position the opponent wins, as slowly as possible
+                all_won = np.minimum.reduceat(successor, segment_starts) > 0
+                loss_distance = np.maximum.reduceat(successor, segment_starts) + 1
+                open_positions = self.values[positions] == 0
+                wins = open_positions & (win_distance <= round_number)
+                losses = open_positions & ~wins & all_won & (loss_distance <= round_number)
+                updates.append((positions[wins], win_distance[wins].astype(np.int16)))
+                updates.append((positions[losses], (-(loss_distance[losses] + 1)).astype(np.int16)))
+                changed += int(wins.sum() + losses.sum())
+            for positions, values in updates:
+                self.values[positions] = values
+            if changed == 0 and round_number > self.max_fixed_distance + 1:
+                break
+            round_number += 1
+        return round_number
+
+    def save(self):
+        for pair in self.pairs:
+            start = self.offsets[pair]
+            table = self.values[start:start + partition_size(*pair)]
+            path = partition_file(self.directory, *pair)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, table)
+            os.replace(tmp_path, path)
+
+
+def build_database(max_pieces=3, directory=DATABASE_DIR):
+    os.makedirs(directory, exist_ok=True)
+    for total in range(2 * MIN_PIECES, 2 * max_pieces + 1):
+        for mover in range(MIN_PIECES, max_pieces + 1):
+            opponent = total - mover
+            if not mover <= opponent <= max_pieces:
+                continue
+            start = time.perf_counter()
+            with tempfile.TemporaryDirectory(dir=directory) as work_dir:
+                builder = PartitionBuilder(directory, mover, opponent, work_dir)
+                builder.generate()
+                rounds = builder.solve()
+                builder.save()
+            values = builder.values[builder.valid]
+            print(f"{mover} v {opponent}: {values.size} positions, {int((values > 0).sum())} wins, "
+                  f"{int((values < 0).sum())} losses, {rounds} rounds, {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the moving-phase endgame database')
+    parser.add_argument('--max-pieces', type=int, default=3, help='pieces per side')
+    parser.add_argument('--output', default=DATABASE_DIR)
+    args = parser.parse_args()
+    build_database(args.max_pieces, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# eval_cache.py
+
+
+class EvaluationCache:
+    # Fixed number of slots with clock (second chance) eviction: a hit sets
+    # the slot's reference bit, and the clock hand clears bits as it sweeps
+    # until it finds a slot that was not used since its last pass. Keys are
+    # compact position keys (see MinimaxAlgorithm.evaluation_key).
+
+    def __init__(self, max_entries=1 << 16):
+        self.max_entries = max_entries
+        self.clear()
+
+    def clear(self):
+        self.slots = {}  # key -> slot
+        self.keys = [None] * self.max_entries
+        self.values = [0.0] * self.max_entries
+        self.referenced = [False] * self.max_entries
+        self.hand = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def get(self, key):
+        # The cached value, or None
+        slot = self.slots.get(key)
+        if slot is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.referenced[slot] = True
+        return self.values[slot]
+
+    def put(self, key, value):
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = self.free_slot()
+            self.slots[key] = slot
+            self.keys[slot] = key
+        self.values[slot] = value
+        self.referenced[slot] = False
+
+    def free_slot(self):
+        referenced = self.referenced
+        while referenced[self.hand]:
+            referenced[self.hand] = False
+            self.hand = (self.hand + 1) % self.max_entries
+        slot = self.hand
+        self.hand = (self.hand + 1) % self.max_entries
+        if self.keys[slot] is not None:
+            del self.slots[self.keys[slot]]
+        return slot
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -1,5 +1,9 @@
 # game.py
 
+from board import (ADJACENCY, MILLS, NO_CAPTURE, NO_SQUARE, SQUARE_MILLS, UNDO_STACK_SIZE, ZOBRIST, ZOBRIST_IN_HAND,
+                   ZOBRIST_MOVING, ZOBRIST_SIDE, encode_board, zobrist_hash)
+
+
 class MorrisGame:
     def __init__(self):
         self.board = [None] * 24  # 24 positions on the board
@@ -8,6 +12,12 @@ class MorrisGame:
         self.phase = 'placing'  # 'placing', 'moving'
         self.moves_made = 0
         self.player_pieces = {'X': 12, 'O': 12}  # Each player has 12 pieces
+        self.mobility = {'X': 0, 'O': 0}  # Moving-phase moves available to each player
+        self.hash = zobrist_hash(self.board, self.current_player, self.phase, self.player_pieces)
+        # One record per make_move not yet undone: [from, to, captured, player, phase, moves made,
+        # 'X' in hand, 'O' in hand, hash], written in place
+        self.undo_stack = [[None] * 9 for _ in range(UNDO_STACK_SIZE)]
+        self.undo_top = 0
 
     def print_board(self):
         positions = [i if x is None else x for i, x in enumerate(self.board)]
@@ -22,26 +32,66 @@ class MorrisGame:
         return self.board[position] is None
 
     def is_valid_move_moving_phase(self, from_pos, to_pos):
-        if self.board[from_pos] == self.current_player and self.board[to_pos] is None:
+        if self.board[from_pos] == self.current_player and self.board[to_pos] is None and to_pos in ADJACENCY[from_pos]:
             return True
         return False
 
+    def set_square(self, position, piece):
+        # Every board write goes through here so the mobility counts stay in step
+        board = self.board
+        old = board[position]
+        if old == piece:
+            return
+        if old is not None:
+            board[position] = None
+            self.hash ^= ZOBRIST[old][position]
+            for n in ADJACENCY[position]:
+                if board[n] is None:
+                    self.mobility[old] -= 1
+                else:
+                    self.mobility[board[n]] += 1
+        if piece is not None:
+            for n in ADJACENCY[position]:
+                if board[n] is None:
+                    self.mobility[piece] += 1
+                else:
+                    self.mobility[board[n]] -= 1
+            board[position] = piece
+            self.hash ^= ZOBRIST[piece][position]
+
+    def adjust_pieces_in_hand(self, player, delta):
+        keys = ZOBRIST_IN_HAND[player]
+        count = self.player_pieces[player]
+        self.hash ^= keys[count] ^ keys[count + delta]
+        self.player_pieces[player] = count + delta
+
+    def push_undo(self, from_pos, to_pos):
+        if self.undo_top == len(self.undo_stack):
+            self.undo_stack.append([None] * 9)
+        self.undo_stack[self.undo_top][:] = (from_pos, to_pos, None, self.current_player, self.phase, self.moves_made,
+                                             self.player_pieces['X'], self.player_pieces['O'], self.hash)
+        self.undo_top += 1
+
     def make_move(self, from_pos, to_pos=None):
         if self.phase == 'placing':
             if self.is_valid_move(from_pos):
-                self.board[from_pos] = self.current_player
-                self.player_pieces[self.current_player] -= 1
+                self.push_undo(from_pos, None)
+                self.set_square(from_pos, self.current_player)
+                self.adjust_pieces_in_hand(self.current_player, -1)
                 self.moves_made += 1
+                # Moving starts once both players have placed every piece
+                if not self.player_pieces['X'] and not self.player_pieces['O']:
+                    self.phase = 'moving'
+                    self.hash ^= ZOBRIST_MOVING
                 if self.check_mill(from_pos):
                     return 'mill'
-                if self.player_pieces[self.current_player] == 0:
-                    self.phase = 'moving'
                 self.switch_player()
                 return True
         elif self.phase == 'moving':
             if self.is_valid_move_moving_phase(from_pos, to_pos):
-                self.board[to_pos] = self.current_player
-                self.board[from_pos] = None
+                self.push_undo(from_pos, to_pos)
+                self.set_square(from_pos, None)
+                self.set_square(to_pos, self.current_player)
                 if self.check_mill(to_pos):
                     return 'mill'
                 self.switch_player()
@@ -50,7 +100,9 @@ class MorrisGame:
 
     def remove_opponent_piece(self, position):
         if self.board[position] == self.get_opponent():
-            self.board[position] = None
+            self.set_square(position, None)
+            if self.undo_top:
+                self.undo_stack[self.undo_top - 1][2] = position
             return True
         return False
 
@@ -58,53 +110,115 @@ class MorrisGame:
         return 'O' if self.current_player == 'X' else 'X'
 
     def check_mill(self, position):
-        mill_combinations = [
-            (0, 1, 2), (3, 4, 5), (6, 7, 8), (9, 10, 11),
-            (12, 13, 14), (15, 16, 17), (18, 19, 20), (21, 22, 23),
-            (0, 9, 21), (3, 10, 18), (6, 11, 15), (1, 4, 7),
-            (16, 19, 22), (8, 12, 17), (5, 13, 20), (2, 14, 23)
-        ]
-        for combo in mill_combinations:
-            if position in combo:
-                if self.board[combo[0]] == self.board[combo[1]] == self.board[combo[2]] == self.current_player:
-                    return True
+        board = self.board
+        player = self.current_player
+        for a, b, c in SQUARE_MILLS[position]:
+            if board[a] == board[b] == board[c] == player:
+                return True
+        return False
+
+    def forms_mill(self, from_pos, to_pos=None):
+        # Whether the move would close a mill for the current player, without making it
+        if to_pos is None:
+            target, vacated = from_pos, None
+        else:
+            target, vacated = to_pos, from_pos
+        for combo in MILLS:
+            if target in combo and all(p == target or (p != vacated and self.board[p] == self.current_player)
+                                       for p in combo):
+                return True
         return False
 
     def switch_player(self):
         self.current_player = 'O' if self.current_player == 'X' else 'X'
+        self.hash ^= ZOBRIST_SIDE
 
     def get_all_valid_moves(self):
-        if self.phase == 'placing':
-            return [i for i in range(24) if self.is_valid_move(i)]
-        elif self.phase == 'moving':
-            moves = []
-            for from_pos in range(24):
-                if self.board[from_pos] == self.current_player:
-                    for to_pos in range(24):
-                        if self.is_valid_move_moving_phase(from_pos, to_pos):
-                            moves.append((from_pos, to_pos))
-            return moves
+        return self.get_all_valid_moves_for_player(self.current_player)
 
     def get_all_valid_moves_for_player(self, player):
+        return list(self.iter_moves(player))
+
+    def iter_moves(self, player=None):
+        # Lazily walks the adjacency graph; placing moves are ints, moving moves (from, to)
+        board = self.board
         if self.phase == 'placing':
-            return [i for i in range(24) if self.board[i] is None]
+            for i in range(24):
+                if board[i] is None:
+                    yield i
         elif self.phase == 'moving':
-            moves = []
+            if player is None:
+                player = self.current_player
             for from_pos in range(24):
-                if self.board[from_pos] == player:
-                    for to_pos in range(24):
-                        if self.board[to_pos] is None:
-                            moves.append((from_pos, to_pos))
-            return moves
+                if board[from_pos] == player:
+                    for to_pos in ADJACENCY[from_pos]:
+                        if board[to_pos] is None:
+                            yield (from_pos, to_pos)
+
+    def generate_moves(self, buffer, player=None):
+        # Fills a caller-owned list instead of allocating a new one
+        buffer.clear()
+        buffer.extend(self.iter_moves(player))
+        return len(buffer)
 
-    def undo_move(self, from_pos, to_pos=None):
+    def count_valid_moves_for_player(self, player):
         if self.phase == 'placing':
-            self.board[from_pos] = None
-            self.player_pieces[self.current_player] += 1
-            self.moves_made -= 1
-        elif self.phase == 'moving':
-            self.board[from_pos] = self.current_player
-            self.board[to_pos] = None
+            return self.board.count(None)
+        return self.mobility[player]
+
+    def undo_move(self, from_pos=None, to_pos=None):
+        # Reverts the last make_move, with any capture made after it, from its
+        # undo record; the arguments are only there for older callers
+        if not self.undo_top:
+            return
+        self.undo_top -= 1
+        (from_pos, to_pos, captured, player, self.phase, self.moves_made,
+         x_pieces, o_pieces, position_hash) = self.undo_stack[self.undo_top]
+        if captured is not None:
+            self.set_square(captured, 'O' if player == 'X' else 'X')
+        if to_pos is None:
+            self.set_square(from_pos, None)
+        else:
+            self.set_square(to_pos, None)
+            self.set_square(from_pos, player)
+        self.current_player = player
+        self.player_pieces['X'] = x_pieces
+        self.player_pieces['O'] = o_pieces
+        self.hash = position_hash
+
+    def turns(self):
+        # Every legal turn packed as in board.pack_turn, a mill-closing move once per capture
+        opponent = self.get_opponent()
+        targets = [pos for pos in range(24) if self.board[pos] == opponent]
+        turns = []
+        for move in self.iter_moves():
+            if isinstance(move, int):
+                turn = move | NO_SQUARE << 5
+                mill = self.forms_mill(move)
+            else:
+                turn = move[1] | move[0] << 5
+                mill = self.forms_mill(move[0], move[1])
+            if mill and targets:
+                turns.extend(turn | target << 10 for target in targets)
+            else:
+                turns.append(turn | NO_CAPTURE)
+        return turns
+
+    def make_turn(self, turn):
+        # Makes a packed turn, capture included, and passes the turn on
+        to_pos, from_pos, captured = turn & 31, turn >> 5 & 31, turn >> 10
+        if from_pos == NO_SQUARE:
+            result = self.make_move(to_pos)
+        else:
+            result = self.make_move(from_pos, to_pos)
+        if result == 'mill':
+            if captured != NO_SQUARE:
+                self.remove_opponent_piece(captured)
+            self.switch_player()
+        return result
+
+    def unmake_turn(self):
+        self.undo_move()
 
     def check_winner(self):
         if self.moves_made == 24:  # All pieces have been placed
@@ -118,15 +232,16 @@ class MorrisGame:
                 return 'Draw'
         return False
 
+    def position_code(self):
+        return encode_board(self.board)
+
+    def count_pieces(self, player):
+        return self.board.count(player)
+
     def count_mills(self, player):
+        board = self.board
         mills = 0
-        mill_combinations = [
-            (0, 1, 2), (3, 4, 5), (6, 7, 8), (9, 10, 11),
-            (12, 13, 14), (15, 16, 17), (18, 19, 20), (21, 22, 23),
-            (0, 9, 21), (3, 10, 18), (6, 11, 15), (1, 4, 7),
-            (16, 19, 22), (8, 12, 17), (5, 13, 20), (2, 14, 23)
-        ]
-        for combo in mill_combinations:
-            if self.board[combo[0]] == self.board[combo[1]] == self.board[combo[2]] == player:
+        for a, b, c in MILLS:
+            if board[a] == board[b] == board[c] == player:
                 mills += 1
         return mills
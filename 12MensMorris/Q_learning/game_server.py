@@ -0,0 +1,313 @@
+# game_server.py
+
+# Hosts many games at once behind a local socket, without Tk. Clients send
+# one JSON object per line and get one JSON line back, in order, and may keep
+# the connection open for any number of requests. Every request may carry an
+# "id", which is echoed in the reply.
+#
+#     {"op": "new", "ai": "ga"}                         -> {"session": ..., "state": {...}}
+#     {"op": "state", "session": s}                     -> {"state": {...}}
+#     {"op": "moves", "session": s}                     -> {"moves": [{"move": 5, "capture": null}, ...]}
+#     {"op": "play", "session": s, "move": [3, 4], "capture": 7}
+#     {"op": "ai_move", "session": s, "time_ms": 500}   -> {"move": ..., "capture": ..., "state": {...}}
+#     {"op": "undo", "session": s}
+#     {"op": "close", "session": s}
+#     {"op": "ping"}
+#
+# Moves are given as get_all_valid_moves gives them (a square when placing,
+# [from, to] when moving), and "capture" names the opponent piece taken when
+# the move closes a mill. Once the game has a winner, "moves" is empty and
+# "play" and "ai_move" are refused. AI moves run in a process pool: 'minimax'
+# searches with the default evaluation weights, 'ga' with the tuned ones in
+# eval_weights.json and 'q' plays the saved Q-table greedily. Searches are
+# time-limited and the reply waits at most the search time plus a grace
+# period, so a busy pool shows up as an error instead of a stalled client.
+# Sessions unused for idle_timeout seconds are dropped.
+#
+#     python game_server.py --port 8765 --workers 4
+#     python game_server.py --unix /tmp/morris.sock
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard_game import BitboardMorrisGame
+from board import pack_turn, turn_for_move, unpack_turn
+from endgame_db import load_endgame
+from minimax import DEFAULT_WEIGHTS, MinimaxAlgorithm, load_weights
+from opening_book import load_book
+from q_learning import QLearningAgent
+from transposition import TranspositionTable
+
+AI_ENGINES = ('minimax', 'ga', 'q')
+OPS = ('new', 'state', 'moves', 'play', 'ai_move', 'undo', 'close', 'ping')
+# Extra time a reply may take beyond the search's own time limit
+GRACE_MS = 1000
+WORKER_TABLE_ENTRIES = 1 << 18
+
+
+class RequestError(Exception):
+    pass
+
+
+def worker_init(q_table_file, endgame_directory=None):
+    # Pool initializer: each worker process loads the engines once
+    global worker_engines
+    game = BitboardMorrisGame()
+    book = load_book()
+    endgame = load_endgame(endgame_directory) if endgame_directory else None
+    worker_engines = {
+        'minimax': MinimaxAlgorithm(game, TranspositionTable(max_entries=WORKER_TABLE_ENTRIES),
+                                    weights=DEFAULT_WEIGHTS, opening_book=book, endgame=endgame),
+        'ga': MinimaxAlgorithm(game, TranspositionTable(max_entries=WORKER_TABLE_ENTRIES),
+                               weights=load_weights(), opening_book=book, endgame=endgame),
+        'q': QLearningAgent(game, epsilon=0.0, epsilon_min=0.0, q_table_file=q_table_file),
+    }
+
+
+def choose_turn(engine, position, depth, time_limit_ms):
+    # Runs in a worker process; position is Session.position()
+    game = BitboardMorrisGame.from_board(*position)
+    if engine == 'q':
+        agent = worker_engines['q']
+        agent.game = game
+        move = agent.choose_action(game.get_all_valid_moves())
+        # The Q-table has no say in captures; take a random piece, as training does
+        return turn_for_move(game.turns(), move)
+    minimax = worker_engines[engine]
+    minimax.game = game
+    return minimax.find_best_turn(depth, time_limit_ms)
+
+
+def parse_turn(request):
+    move, capture = request.get('move'), request.get('capture')
+    if isinstance(move, list) and len(move) == 2:
+        move = tuple(move)
+    squares = move if isinstance(move, tuple) else (move,)
+    if capture is not None:
+        squares += (capture,)
+    if not all(isinstance(square, int) and 0 <= square < 24 for square in squares):
+        raise RequestError(f"bad move {request.get('move')!r} or capture {capture!r}")
+    return pack_turn(move, capture)
+
+
+class Session:
+    def __init__(self, ai='minimax'):
+        self.game = BitboardMorrisGame()
+        self.ai = ai
+        self.lock = asyncio.Lock()  # One move at a time, however many connections use the session
+        self.last_used = time.monotonic()
+
+    def position(self):
+        game = self.game
+        return game.board, game.current_player, game.phase, game.moves_made, game.player_pieces
+
+    def state(self):
+        game = self.game
+        return {'board': game.board, 'current_player': game.current_player, 'phase': game.phase,
+                'moves_made': game.moves_made, 'pieces_in_hand': dict(game.player_pieces),
+                'winner': game.check_winner() or None}
+
+    def moves(self):
+        if self.game.check_winner():
+            return []
+        return [dict(zip(('move', 'capture'), unpack_turn(turn))) for turn in self.game.turns()]
+
+
+class GameServer:
+    def __init__(self, workers=None, idle_timeout=600, max_sessions=10000, depth=None, move_time_ms=1000,
+                 q_table_file='q_table.pkl', endgame_directory=None):
+        self.sessions = {}
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.depth = depth
+        self.move_time_ms = move_time_ms  # Default and upper bound of an AI move's search time
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=worker_init,
+                                            initargs=(q_table_file, endgame_directory))
+        self.server = None
+        self.evictor = None
+        self.connections = {}  # writer -> task serving that connection
+
+    async def start(self, host='127.0.0.1', port=8765, unix_path=None):
+        if unix_path is not None:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)  # Left behind by a server that was killed
+            self.server = await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, host, port)
+        self.evictor = asyncio.create_task(self.evict_idle_sessions())
+        return self.server
+
+    async def close(self):
+        if self.evictor is not None:
+            self.evictor.cancel()
+        if self.server is not None:
+            self.server.close()
+            # Closing the transports ends each connection's read loop
+            for writer in list(self.connections):
+                writer.close()
+            await asyncio.gather(*self.connections.values(), return_exceptions=True)
+            await self.server.wait_closed()
+        self.executor.shutdown(cancel_futures=True)
+
+    async def evict_idle_sessions(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 4))
+            self.evict(time.monotonic() - self.idle_timeout)
+
+    def evict(self, before):
+        for session_id in [s for s, session in self.sessions.items()
+                           if session.last_used < before and not session.lock.locked()]:
+            del self.sessions[session_id]
+
+    async def handle_connection(self, reader, writer):
+        self.connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                reply = await self.handle_line(line)
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            del self.connections[writer]
+            writer.close()
+
+    async def handle_line(self, line):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RequestError("request must be a JSON object")
+            request_id = request.get('id')
+            reply = await self.handle(request)
+        except json.JSONDecodeError as error:
+            reply = {'error': f"bad JSON: {error}"}
+        except RequestError as error:
+            reply = {'error': str(error)}
+        except Exception as error:
+            # Keep serving the connection whatever one request did
+            reply = {'error': f"internal error: {error!r}"}
+        if request_id is not None:
+            reply['id'] = request_id
+        return reply
+
+    def session(self, request):
+        session = self.sessions.get(request.get('session'))
+        if session is None:
+            raise RequestError(f"no session {request.get('session')!r}")
+        session.last_used = time.monotonic()
+        return session
+
+    async def handle(self, request):
+        op = request.get('op')
+        if op not in OPS:
+            raise RequestError(f"unknown op {op!r}")
+        if op == 'ping':
+            return {'ok': True}
+        if op == 'new':
+            return self.new_session(request.get('ai', 'minimax'))
+        session = self.session(request)
+        if op == 'state':
+            return {'state': session.state()}
+        if op == 'moves':
+            return {'moves': session.moves()}
+        if op == 'close':
+            del self.sessions[request['session']]
+            return {'ok': True}
+        async with session.lock:
+            if op == 'play':
+                if session.game.check_winner():
+                    raise RequestError("game is over")
+                turn = parse_turn(request)
+                if turn not in session.game.turns():
+                    raise RequestError("illegal move")
+                session.game.make_turn(turn)
+                return {'state': session.state()}
+            if op == 'ai_move':
+                return await self.ai_move(session, request)
+            if op == 'undo':
+                session.game.unmake_turn()
+                return {'state': session.state()}
+
+    def new_session(self, ai):
+        if ai not in AI_ENGINES:
+            raise RequestError(f"ai must be one of {', '.join(AI_ENGINES)}")
+        if len(self.sessions) >= self.max_sessions:
+            self.evict(time.monotonic() - self.idle_timeout)
+            if len(self.sessions) >= self.max_sessions:
+                raise RequestError("too many sessions")
+        session_id = uuid.uuid4().hex
+        session = self.sessions[session_id] = Session(ai)
+        return {'session': session_id, 'state': session.state()}
+
+    async def ai_move(self, session, request):
+        engine = request.get('ai', session.ai)
+        if engine not in AI_ENGINES:
+            raise RequestError(f"ai must be one of {', '.join(AI_ENGINES)}")
+        if session.game.check_winner() or not session.game.turns():
+            raise RequestError("game is over")
+        time_ms = request.get('time_ms', self.move_time_ms)
+        depth = request.get('depth', self.depth)
+        if not isinstance(time_ms, (int, float)) or time_ms <= 0 or not (depth is None or isinstance(depth, int)):
+            raise RequestError("time_ms must be a positive number and depth an int")
+        time_ms = min(time_ms, self.move_time_ms)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, choose_turn, engine, session.position(), depth, time_ms)
+        try:
+            turn = await asyncio.wait_for(future, (time_ms + GRACE_MS) / 1000)
+        except asyncio.TimeoutError:
+            raise RequestError("AI move timed out") from None
+        if turn is None:
+            raise RequestError("AI found no move")
+        session.game.make_turn(turn)
+        session.last_used = time.monotonic()
+        move, capture = unpack_turn(turn)
+        return {'move': move, 'capture': capture, 'state': session.state()}
+
+
+async def serve(args):
+    server = GameServer(args.workers, args.idle_timeout, args.max_sessions, args.depth, args.move_time_ms,
+                        args.q_table_file, args.endgame)
+    await server.start(args.host, args.port, args.unix)
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"Serving on {where} with {args.workers or os.cpu_count()} workers")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="12 Men's Morris game server (JSON lines)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='listen on this Unix socket path instead of TCP')
+    parser.add_argument('--workers', type=int, default=None, help='AI worker processes (default: one per CPU)')
+    parser.add_argument('--idle-timeout', type=float, default=600, help='seconds before an unused session is dropped')
+    parser.add_argument('--max-sessions', type=int, default=10000)
+    parser.add_argument('--depth', type=int, default=None, help='search depth cap (default: time limit only)')
+    parser.add_argument('--move-time-ms', type=int, default=1000, help='default and maximum AI search time')
+    parser.add_argument('--q-table-file', default='q_table.pkl')
+    parser.add_argument('--endgame', metavar='DIR', help='endgame database to probe (off by default: it is only '
+                        'reached from set-up positions, as games end once all pieces are placed)')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# headless_train.py
+
+# Trains the Q-learning agent without Tk. Each round, worker processes play
+# games on their own BitboardMorrisGame against a read-only copy of the Q-table
+# and send their experience back; the learner applies the updates in worker
+# order and hands the merged table to the next round.
+
+import argparse
+import multiprocessing
+import random
+import time
+
+from batch_env import BatchMorrisEnv
+from bitboard_game import BitboardMorrisGame
+from board import turn_for_move
+from linear_agent import LinearQAgent
+from minimax import MinimaxAlgorithm, load_weights
+from q_learning import QLearningAgent
+from transposition import TranspositionTable
+
+# Games end once all 24 pieces are placed; this only guards against a stuck
+# game, which is then counted as 'Unfinished'
+MAX_PLIES = 200
+
+worker_q_table = {}
+
+
+def set_worker_q_table(q_table):
+    # Pool initializer; with the fork start method the table is inherited, not pickled
+    global worker_q_table
+    worker_q_table = q_table
+
+
+def reward_for(winner, player):
+    if winner == player:
+        return 1
+    if winner in ('X', 'O'):
+        return -1
+    return 0
+
+
+def play_training_game(agent, opponent, minimax=None, max_depth=3, move_time_ms=None):
+    # Plays one game with the agent as 'X' (and as 'O' too in self-play) and
+    # returns its transitions and the winner. A transition runs from one of a
+    # side's turns to its next one; each side's last carries the final result
+    # and no next moves. Rewards are for the side that moved, except for a
+    # LinearQAgent, whose values are always from its own player's side.
+    game = BitboardMorrisGame()
+    agent.game = game
+    if minimax is not None:
+        minimax.game = game
+    learners = ('X', 'O') if opponent == 'self' else ('X',)
+    perspective = agent.player if isinstance(agent, LinearQAgent) else None
+    pending = {}  # player -> (state, action) of their last turn
+    experience = []
+    plies = 0
+    while not game.check_winner() and plies < MAX_PLIES:
+        valid_moves = game.get_all_valid_moves()
+        if not valid_moves:
+            break
+        player = game.current_player
+        if player in learners:
+            state = agent.get_state()
+            if player in pending:
+                experience.append(pending.pop(player) + (0, state, valid_moves))
+            action = agent.choose_action(valid_moves)
+            pending[player] = (state, action)
+            game.make_turn(turn_for_move(game.turns(), action))
+        else:
+            game.make_turn(minimax.find_best_turn(max_depth, time_limit_ms=move_time_ms))
+        plies += 1
+    winner = game.check_winner()
+    final_state = agent.get_state()
+    for player, (state, action) in pending.items():
+        experience.append((state, action, reward_for(winner, perspective or player), final_state, []))
+    return experience, winner
+
+
+def run_worker(seed, num_games, opponent, max_depth, move_time_ms, epsilon, backend='dict', symmetry=False):
+    # backend 'linear' plays with a LinearQAgent, whose weights stand in for the Q-table
+    random.seed(seed)
+    if backend == 'linear':
+        agent = LinearQAgent(BitboardMorrisGame(), epsilon=epsilon, weights_file=None)
+    else:
+        agent = QLearningAgent(BitboardMorrisGame(), epsilon=epsilon, q_table_file=None, backend=backend,
+                               symmetry=symmetry)
+    agent.q_table = worker_q_table
+    minimax = None
+    if opponent == 'minimax':
+        minimax = MinimaxAlgorithm(agent.game, TranspositionTable(max_entries=1 << 16), weights=load_weights())
+    games = []
+    for _ in range(num_games):
+        games.append(play_training_game(agent, opponent, minimax, max_depth, move_time_ms))
+    return games
+
+
+class HeadlessTrainer:
+    def __init__(self, agent, workers=None, games_per_worker=4, opponent='minimax', max_depth=3,
+                 move_time_ms=None, seed=0):
+        self.agent = agent
+        self.workers = workers or multiprocessing.cpu_count()
+        self.games_per_worker = games_per_worker
+        self.opponent = opponent  # 'minimax' or 'self'
+        self.max_depth = max_depth
+        self.move_time_ms = move_time_ms
+        self.seed = seed
+        self.games_played = 0
+        self.results = {'X': 0, 'O': 0, 'Draw': 0, 'Unfinished': 0}
+        if isinstance(agent, LinearQAgent):
+            self.backend, self.symmetry = 'linear', False
+        else:
+            self.backend, self.symmetry = agent.backend, agent.symmetry
+
+    def learn(self, experience):
+        for state, action, reward, next_state, next_valid_moves in experience:
+            self.agent.update_q_value(state, action, reward, next_state, next_valid_moves)
+            self.agent.decay_epsilon()
+
+    def run_round(self, num_games):
+        workers = min(self.workers, max(1, -(-num_games // self.games_per_worker)))
+        tasks = []
+        remaining = num_games
+        for i in range(workers):
+            count = min(self.games_per_worker, remaining) if i < workers - 1 else remaining
+            remaining -= count
+            tasks.append((self.seed + self.games_played + i, count, self.opponent,
+                          self.max_depth, self.move_time_ms, self.agent.epsilon, self.backend, self.symmetry))
+        with multiprocessing.Pool(workers, initializer=set_worker_q_table,
+                                  initargs=(self.agent.q_table,)) as pool:
+            batches = pool.starmap(run_worker, tasks)
+        for games in batches:
+            for experience, winner in games:
+                self.learn(experience)
+                self.results[winner or 'Unfinished'] += 1
+                self.games_played += 1
+
+    def train(self, num_games):
+        start = time.perf_counter()
+        round_size = self.workers * self.games_per_worker
+        while self.games_played < num_games:
+            self.run_round(min(round_size, num_games - self.games_played))
+            self.agent.save_q_table()
+        elapsed = time.perf_counter() - start
+        return self.games_played / elapsed if elapsed > 0 else 0.0
+
+
+def train_batched(agent, num_games, batch_size=256, seed=None):
+    # Self-play on BatchMorrisEnv with one batched TD update per step; needs
+    # an agent with backend='dense'. Returns games/s.
+    env = BatchMorrisEnv(batch_size, seed=seed)
+    start = time.perf_counter()
+    states = env.position_codes()
+    masks = env.legal_mask()
+    while env.games_finished < num_games:
+        actions = agent.choose_actions(states, masks)
+        _, rewards, dones, _ = env.step(actions)
+        next_states = env.position_codes()
+        next_masks = env.legal_mask()
+        agent.batch_update(states, actions, rewards, next_states, next_masks, dones, zero_sum=True)
+        agent.epsilon = max(agent.epsilon_min, agent.epsilon * agent.epsilon_decay ** int(dones.sum()))
+        states, masks = next_states, next_masks
+    agent.save_q_table()
+    elapsed = time.perf_counter() - start
+    return env.games_finished / elapsed if elapsed > 0 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Q-learning training for 12 Men's Morris")
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--games-per-worker', type=int, default=4)
+    parser.add_argument('--opponent', choices=['minimax', 'self'], default='minimax')
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--move-time-ms', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', choices=['dict', 'compact', 'dense', 'linear'], default='dict',
+                        help="Q-table storage: 'dict' has the fastest single lookups; 'compact' needs about 16 "
+                             "bytes per entry instead of 340 and can be memory-mapped, but each lookup is 1.5-2x "
+                             "slower; 'dense' is for --batch-size training; 'linear' trains a LinearQAgent")
+    parser.add_argument('--q-table-file', default=None)
+    parser.add_argument('--symmetry', action='store_true')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='self-play on a batched environment instead (uses the dense backend)')
+    args = parser.parse_args()
+
+    if args.batch_size:
+        args.backend = 'dense'
+    default_files = {'dict': 'q_table.pkl', 'compact': 'q_table.npy', 'dense': 'q_table.npz', 'linear': 'linear_q.npy'}
+    q_table_file = args.q_table_file or default_files[args.backend]
+    if args.backend == 'linear':
+        agent = LinearQAgent(BitboardMorrisGame(), weights_file=q_table_file)
+    else:
+        agent = QLearningAgent(BitboardMorrisGame(), q_table_file=q_table_file, backend=args.backend, journal=True,
+                               symmetry=args.symmetry)
+    if args.batch_size:
+        games_per_second = train_batched(agent, args.games, args.batch_size, args.seed)
+        agent.close_q_table()
+        print(f"Training complete: {args.games}+ games, {games_per_second:.2f} games/s")
+        return
+    trainer = HeadlessTrainer(agent, args.workers, args.games_per_worker, args.opponent, args.depth,
+                              args.move_time_ms, args.seed)
+    games_per_second = trainer.train(args.games)
+    agent.close_q_table()
+    print(f"Training complete: {trainer.games_played} games, {games_per_second:.2f} games/s, results {trainer.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# linear_agent.py
+
+# Q-learning with a linear value function instead of a table, so unseen
+# positions still get a sensible value and the model stays a fixed size.
+# Q(state, action) is w . features(board after the action), with features
+# from the point of view of the agent's player: per-square occupancy, piece
+# counts, mills, open twos (two pieces and an empty square in a line) and
+# mobility for both sides, plus a bias. All legal actions of a position are
+# scored with one matrix product.
+
+import os
+import random
+
+import numpy as np
+
+from board import ADJACENCY, MILLS
+
+MILL_INDEX = np.array(MILLS, dtype=np.intp)
+ADJACENCY_MATRIX = np.zeros((24, 24), dtype=np.float64)
+for _square, _neighbours in enumerate(ADJACENCY):
+    ADJACENCY_MATRIX[_square, list(_neighbours)] = 1.0
+SQUARE_SHIFTS = np.arange(24, dtype=np.int64)
+NUM_FEATURES = 24 + 24 + 2 * 4 + 1
+
+
+def board_features(own_bits, opponent_bits):
+    # own_bits and opponent_bits are arrays of 24-bit masks; returns one
+    # feature row per position
+    own = ((np.asarray(own_bits, dtype=np.int64)[:, None] >> SQUARE_SHIFTS) & 1).astype(np.float64)
+    opponent = ((np.asarray(opponent_bits, dtype=np.int64)[:, None] >> SQUARE_SHIFTS) & 1).astype(np.float64)
+    empty = 1.0 - own - opponent
+    columns = [own, opponent]
+    empty_lines = empty[:, MILL_INDEX].sum(axis=2)
+    for pieces in (own, opponent):
+        lines = pieces[:, MILL_INDEX].sum(axis=2)
+        columns.append(pieces.sum(axis=1, keepdims=True) / 12)
+        columns.append((lines == 3).sum(axis=1, keepdims=True) / 4)
+        columns.append(((lines == 2) & (empty_lines == 1)).sum(axis=1, keepdims=True) / 4)
+        columns.append(((pieces @ ADJACENCY_MATRIX) * empty).sum(axis=1, keepdims=True) / 24)
+    columns.append(np.ones((len(own), 1)))
+    return np.hstack(columns)
+
+
+class LinearQAgent:
+    def __init__(self, game, alpha=0.01, gamma=0.9, epsilon=1.0, epsilon_decay=0.995, epsilon_min=0.1,
+                 weights_file='linear_q.npy', player='X'):
+        self.game = game
+        self.alpha = alpha
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.epsilon_decay = epsilon_decay
+        self.epsilon_min = epsilon_min
+        self.weights_file = weights_file
+        self.player = player  # Values are from this player's point of view
+        self.weights = self.load_weights()
+
+    # Trainers share and ship the model the same way as a tabular Q-table
+    @property
+    def q_table(self):
+        return self.weights
+
+    @q_table.setter
+    def q_table(self, weights):
+        self.weights = weights
+
+    def load_weights(self):
+        if self.weights_file is not None and os.path.exists(self.weights_file):
+            weights = np.load(self.weights_file)
+            if weights.shape == (NUM_FEATURES,):
+                return weights
+        return np.zeros(NUM_FEATURES)
+
+    def save_q_table(self):
+        if self.weights_file is None:
+            return
+        tmp_path = self.weights_file + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, self.weights)
+        os.replace(tmp_path, self.weights_file)
+
+    def close_q_table(self):
+        self.save_q_table()
+
+    def clear_q_table(self):
+        self.weights = np.zeros(NUM_FEATURES)
+        if self.weights_file is not None and os.path.exists(self.weights_file):
+            os.remove(self.weights_file)
+
+    def get_state(self):
+        # The mover matters here, since actions are applied for them
+        return self.game.position_code(), self.game.current_player
+
+    def action_features(self, state, actions):
+        # Features of the board after each action, before any mill capture
+        code, mover = state
+        bits = {'X': code & 0xFFFFFF, 'O': code >> 24}
+        target = np.array([action if isinstance(action, int) else action[1] for action in actions], dtype=np.int64)
+        source = np.array([-1 if isinstance(action, int) else action[0] for action in actions], dtype=np.int64)
+        moved = bits[mover] | (np.int64(1) << target)
+        moved &= ~np.where(source >= 0, np.int64(1) << np.maximum(source, 0), 0)
+        other = np.full(len(actions), bits['O' if mover == 'X' else 'X'], dtype=np.int64)
+        if mover == self.player:
+            return board_features(moved, other)
+        return board_features(other, moved)
+
+    def q_values(self, state, actions):
+        if not actions:
+            return np.zeros(0)
+        return self.action_features(state, actions) @ self.weights
+
+    def get_q_value(self, state, action):
+        return float(self.q_values(state, [action])[0])
+
+    def choose_action(self, valid_moves):
+        if not valid_moves:
+            return None
+
+        if random.uniform(0, 1) < self.epsilon:
+            return random.choice(valid_moves)
+        q_values = self.q_values(self.get_state(), valid_moves)
+        # The opponent's moves are chosen for the lowest value to the agent
+        if self.game.current_player != self.player:
+            q_values = -q_values
+        best = np.flatnonzero(q_values == q_values.max())
+        return valid_moves[random.choice(best.tolist())]
+
+    def update_q_value(self, state, action, reward, next_state, next_valid_moves, weight=1.0):
+        # Semi-gradient TD step; returns the TD error
+        features = self.action_features(state, [action])[0]
+        future_q = 0.0
+        if next_valid_moves:
+            next_q = self.q_values(next_state, next_valid_moves)
+            future_q = next_q.max() if next_state[1] == self.player else next_q.min()
+        td_error = reward + self.gamma * future_q - features @ self.weights
+        self.weights += self.alpha * weight * td_error * features
+        return float(td_error)
+
+    def decay_epsilon(self):
+        if self.epsilon > self.epsilon_min:
+            self.epsilon *= self.epsilon_decay
@@ -4,7 +4,16 @@ import tkinter as tk
 from tkinter import messagebox
 from game import MorrisGame
 from q_learning import QLearningAgent
-from minimax import MinimaxAlgorithm
+from minimax import MinimaxAlgorithm, load_weights
+from board import unpack_turn
+from eval_cache import EvaluationCache
+from opening_book import load_book
+from search_worker import SearchWorker
+
+# Pause between training moves so they can be followed on the board, unless "Max speed" is ticked
+TRAINING_DELAY_MS = 1000
+# How often a running search is checked for progress and its result
+SEARCH_POLL_MS = 50
 
 
 class MorrisApp:
@@ -21,13 +30,32 @@ class MorrisApp:
         self.train_button = tk.Button(self.main_menu, text="Train Agent", command=self.train_agent)
         self.train_button.pack(pady=10)
 
+        self.max_speed = tk.BooleanVar(value=False)
+        self.max_speed_button = tk.Checkbutton(self.main_menu, text="Max speed training", variable=self.max_speed)
+        self.max_speed_button.pack(pady=10)
+
         self.clear_button = tk.Button(self.main_menu, text="Clear Learning Data", command=self.clear_learning_data)
         self.clear_button.pack(pady=10)
 
         self.game_frame = tk.Frame(root)
         self.max_depth = 3  # Set the depth for the Minimax algorithm
+        self.move_time_ms = 1000  # Time budget per Minimax move
         self.train_num_games = 10  # Number of training games
         self.train_game_index = 0  # Current training game index
+        self.search_worker = None
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+    def close(self):
+        if self.search_worker is not None:
+            self.search_worker.close()
+        self.root.destroy()
+
+    def create_minimax(self):
+        self.minimax = MinimaxAlgorithm(self.game, weights=load_weights(), opening_book=load_book(),
+                                        eval_cache=EvaluationCache())
+        if self.search_worker is not None:
+            self.search_worker.close()
+        self.search_worker = SearchWorker(self.minimax)
 
     def play_game(self):
         self.main_menu.pack_forget()
@@ -38,8 +66,8 @@ class MorrisApp:
         self.main_menu.pack_forget()
         self.game_frame.pack()
         self.game = MorrisGame()
-        self.q_agent = QLearningAgent(self.game)
-        self.minimax = MinimaxAlgorithm(self.game)
+        self.q_agent = QLearningAgent(self.game, journal=True)
+        self.create_minimax()
         self.setup_board()
         self.train_agent_game()
 
@@ -52,18 +80,21 @@ class MorrisApp:
     def run_game(self):
         self.game = MorrisGame()
         self.q_agent = QLearningAgent(self.game)
+        self.create_minimax()
 
         def on_click(event):
-            if self.game.current_player == 'X':
+            if self.game.current_player == 'X' and not self.search_worker.running():
                 position = int(event.widget["text"])
                 result = self.game.make_move(position)
+                if not result:
+                    return
                 self.update_board()
                 if result == 'mill':
                     self.prompt_remove_opponent_piece()
                 else:
+                    # make_move has passed the turn
                     self.check_game_end()
-                    self.game.switch_player()
-                    self.root.after(1000, self.computer_turn)
+                    self.computer_turn()
 
         self.setup_board(on_click)
 
@@ -91,6 +122,8 @@ class MorrisApp:
                 button.bind("<Button-1>", on_click)
             self.buttons.append(button)
 
+        self.thinking_label = tk.Label(self.game_frame, text="")
+        self.thinking_label.grid(row=8, columnspan=7)
         self.update_board()
 
     def update_board(self):
@@ -116,7 +149,7 @@ class MorrisApp:
         self.info_label.destroy()
         self.check_game_end()
         self.game.switch_player()
-        self.root.after(1000, self.computer_turn)
+        self.computer_turn()
 
     def check_game_end(self):
         result = self.game.check_winner()
@@ -130,39 +163,39 @@ class MorrisApp:
             messagebox.showinfo("Game Over", "It's a draw!")
             self.root.quit()
 
+    def start_search(self, on_done):
+        # Searches in the background and calls on_done(turn) on the Tk thread when it finishes
+        self.thinking_label.config(text="Thinking...")
+        self.search_worker.start(self.game, self.max_depth, self.move_time_ms)
+        self.root.after(SEARCH_POLL_MS, self.poll_search, self.search_worker.future, on_done)
+
+    def poll_search(self, search, on_done):
+        worker = self.search_worker
+        if worker.future is not search:
+            return  # Cancelled, or replaced by a newer search
+        if worker.done():
+            self.thinking_label.config(text="")
+            on_done(worker.result())
+            return
+        depth, best = worker.progress()
+        if best is not None:
+            move, capture = best
+            best_text = f"{move}" if capture is None else f"{move}, taking {capture}"
+            self.thinking_label.config(text=f"Thinking... depth {depth}, best move {best_text}")
+        self.root.after(SEARCH_POLL_MS, self.poll_search, search, on_done)
+
     def computer_turn(self):
-        if self.game.current_player == 'O':
-            valid_moves = self.game.get_all_valid_moves()
-            action = self.minimax.find_best_move(self.max_depth)
-            if action is not None:
-                print(f"Minimax Algorithm chose action: {action}")
-                if isinstance(action, int):
-                    result = self.game.make_move(action)
-                else:
-                    result = self.game.make_move(action[0], action[1])
-                self.update_board()
-                if result == 'mill':
-                    self.root.after(1000, self.computer_remove_piece)
-                else:
-                    if self.game.check_winner():
-                        messagebox.showinfo("Game Over", f"Winner: {self.game.get_opponent()}")
-                        self.root.quit()
-                    else:
-                        self.check_game_end()
-                        self.game.switch_player()
+        if self.game.current_player == 'O' and not self.game.check_winner():
+            self.start_search(self.finish_computer_turn)
 
-    def computer_remove_piece(self):
-        for pos in range(24):
-            if self.game.board[pos] == 'X':
-                self.game.remove_opponent_piece(pos)
-                break
+    def finish_computer_turn(self, turn):
+        if turn is None:
+            return
+        print(f"Minimax Algorithm chose action: {unpack_turn(turn)}")
+        # make_turn makes the capture the search chose and passes the turn
+        self.game.make_turn(turn)
         self.update_board()
-        if self.game.check_winner():
-            messagebox.showinfo("Game Over", f"Winner: {self.game.get_opponent()}")
-            self.root.quit()
-        else:
-            self.check_game_end()
-            self.game.switch_player()
+        self.check_game_end()
 
     def train_agent_game(self):
         self.run_training_game()
@@ -170,7 +203,7 @@ class MorrisApp:
     def run_training_game(self):
         self.game = MorrisGame()
         self.q_agent.game = self.game
-        self.minimax.game = self.game
+        self.minimax.new_game()
         self.train_game_step()
 
     def train_game_step(self):
@@ -193,44 +226,42 @@ class MorrisApp:
                     self.q_agent.update_q_value(state, action, reward, next_state, next_valid_moves)
                     self.q_agent.decay_epsilon()
                     self.update_board()
+                    # make_move only passes the turn when no mill was closed
                     if result == 'mill':
-                        self.root.after(1000, self.train_game_step)
-                    else:
                         self.game.switch_player()
-                        self.root.after(1000, self.train_game_step)
+                    self.root.after(self.training_delay(), self.train_game_step)
             else:
-                # Minimax algorithm's turn
+                # Minimax algorithm's turn, searched in the background
                 print("Minimax Algorithm's Turn")
-                best_move = self.minimax.find_best_move(self.max_depth)
-                if best_move is not None:
-                    print(f"Minimax Algorithm chose action: {best_move}")
-                    if isinstance(best_move, int):
-                        self.game.make_move(best_move)
-                    else:
-                        self.game.make_move(best_move[0], best_move[1])
-                    self.update_board()
-                    if self.game.check_winner():
-                        self.q_agent.save_q_table()
-                        self.train_game_index += 1
-                        if self.train_game_index < self.train_num_games:
-                            self.root.after(1000, self.run_training_game)
-                        else:
-                            messagebox.showinfo("Training Complete", "Agent training complete!")
-                            self.main_menu.pack()
-                            self.game_frame.pack_forget()
-                    else:
-                        self.game.switch_player()
-                        self.root.after(1000, self.train_game_step)
+                self.start_search(self.finish_training_turn)
         else:
-            self.q_agent.save_q_table()
-            self.train_game_index += 1
-            if self.train_game_index < self.train_num_games:
-                self.root.after(1000, self.run_training_game)
-            else:
-                messagebox.showinfo("Training Complete", "Agent training complete!")
-                self.main_menu.pack()
-                self.game_frame.pack_forget()
+            self.finish_training_game()
+
+    def training_delay(self):
+        return 0 if self.max_speed.get() else TRAINING_DELAY_MS
 
+    def finish_training_turn(self, turn):
+        if turn is None:
+            self.finish_training_game()
+            return
+        print(f"Minimax Algorithm chose action: {unpack_turn(turn)}")
+        # make_turn makes any capture and passes the turn
+        self.game.make_turn(turn)
+        self.update_board()
+        if self.game.check_winner():
+            self.finish_training_game()
+        else:
+            self.root.after(self.training_delay(), self.train_game_step)
+
+    def finish_training_game(self):
+        self.q_agent.save_q_table()
+        self.train_game_index += 1
+        if self.train_game_index < self.train_num_games:
+            self.root.after(self.training_delay(), self.run_training_game)
+        else:
+            messagebox.showinfo("Training Complete", "Agent training complete!")
+            self.main_menu.pack()
+            self.game_frame.pack_forget()
 
 if __name__ == "__main__":
     root = tk.Tk()
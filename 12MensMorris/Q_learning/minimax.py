@@ -1,93 +1,386 @@
 # minimax.py
 
+import json
 import math
+import os
+import time
+from board import NO_SQUARE, unpack_turn
+from symmetry import canonical_code, restore_turn, transform_turn
+from transposition import EXACT, LOWER_BOUND, UPPER_BOUND, TranspositionTable
+
+# Mixed into the position hash so max and min nodes of a position get separate entries
+MAXIMIZING_KEY = 0x5F3A9C1D2B7E4680
+
+# Spreads the bits of a symmetry-reduced position key over the table index
+FIBONACCI = 0x9E3779B97F4A7C15
+MASK_64 = (1 << 64) - 1
+
+# Score of a won game, or of a won endgame position less the plies it takes; far above any evaluation
+ENDGAME_WIN = 10000
+
+# Depth cap for a time-limited search when no depth is given
+MAX_ITERATIVE_DEPTH = 64
+
+# Nodes searched between clock checks
+TIME_CHECK_INTERVAL = 1024
+
+
+# Evaluation weights for the piece, mill and mobility differences
+DEFAULT_WEIGHTS = (1.0, 10.0, 0.1)
+# Where tuned weights (see 'Genetic Algorithm/weights_ga.py') are kept
+WEIGHTS_FILE = 'eval_weights.json'
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def load_weights(path=WEIGHTS_FILE):
+    # The default weights if no tuned weights have been saved
+    if not os.path.exists(path):
+        return DEFAULT_WEIGHTS
+    with open(path) as f:
+        weights = json.load(f)['weights']
+    if len(weights) != len(DEFAULT_WEIGHTS):
+        raise ValueError(f"{path} holds {len(weights)} weights, expected {len(DEFAULT_WEIGHTS)}")
+    return tuple(float(weight) for weight in weights)
+
+
+def save_weights(weights, path=WEIGHTS_FILE, **info):
+    # info is stored alongside, e.g. the fitness the weights reached
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(dict(info, weights=[float(weight) for weight in weights]), f, indent=2)
+    os.replace(tmp_path, path)
+
 
 class MinimaxAlgorithm:
-    def __init__(self, game):
+    def __init__(self, game, transposition_table=None, stats=None, symmetric_cache=False, weights=None,
+                 opening_book=None, endgame=None, eval_cache=None):
         self.game = game
+        self.weights = tuple(weights) if weights is not None else DEFAULT_WEIGHTS
+        self.opening_book = opening_book  # Optional OpeningBook, consulted before searching
+        self.endgame = endgame  # Optional EndgameDatabase, probed at leaves
+        self.eval_cache = eval_cache  # Optional EvaluationCache, kept across searches until new_game()
+        self.transposition_table = transposition_table if transposition_table is not None else TranspositionTable()
+        self.stats = stats  # Optional SearchStats
+        # Share table entries between positions that are rotations/reflections of each other
+        self.symmetric_cache = symmetric_cache
+        self.killers = []  # Two quiet moves per ply that caused a cutoff
+        self.history = {}  # move -> accumulated cutoff score
+        self.principal_variation = []
+        self.completed_depth = 0
+        self.deadline = None
+        self.stopped = False  # Set by stop() from another thread; cleared by whoever starts the next search
+        self.nodes = 0
+        self.best_capture = None  # Square the last find_best_move captures, if its move closes a mill
 
-    def minimax(self, depth, alpha, beta, maximizing_player):
-        if depth == 0 or self.game.check_winner():
-            return self.evaluate_board()
+    # The search works on whole turns packed into ints (see board.pack_turn),
+    # so captures are searched like any other move and each one is undone
+    # from the engine's undo stack without copying the board
+
+    def apply_move(self, move):
+        self.game.make_turn(move)
+
+    def revert_move(self):
+        self.game.unmake_turn()
+
+    def ordered_moves(self, hash_move, ply=0):
+        # Hash/PV move first, then captures, killers and history score
+        moves = self.game.turns()
+        if len(moves) < 2:
+            return moves
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        history = self.history
+
+        def score(move):
+            if move == hash_move:
+                return 1 << 30
+            if move >> 10 != NO_SQUARE:
+                return (1 << 29) + history.get(move, 0)
+            if move in killers:
+                return 1 << 28
+            return history.get(move, 0)
+
+        moves.sort(key=score, reverse=True)
+        return moves
+
+    def record_cutoff(self, move, depth, ply):
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self.history[move] = self.history.get(move, 0) + depth * depth
+        if self.stats is not None:
+            self.stats.cutoffs += 1
+
+    def table_key(self, maximizing_player):
+        # Returns (key, symmetry index); the index maps stored moves onto this board
+        if self.symmetric_cache:
+            code, index, _ = canonical_code(self.game.position_code())
+            pieces = self.game.player_pieces
+            key = code | (self.game.current_player == 'O') << 48 | (self.game.phase == 'moving') << 49 \
+                | pieces['X'] << 50 | pieces['O'] << 54
+            key = key * FIBONACCI & MASK_64
+            key ^= key >> 32  # Low bits pick the bucket; fold the well-mixed high bits into them
+        else:
+            key, index = self.game.hash, 0
+        return (key ^ MAXIMIZING_KEY if maximizing_player else key), index
+
+    def probe_table(self, maximizing_player):
+        key, index = self.table_key(maximizing_player)
+        entry = self.transposition_table.probe(key)
+        if entry is not None and index and entry[3] is not None:
+            entry = entry[:3] + (restore_turn(index, entry[3]),)
+        return key, index, entry
+
+    def store_table(self, key, index, depth, value, flag, move):
+        if index and move is not None:
+            move = transform_turn(index, move)
+        self.transposition_table.store(key, depth, value, flag, move)
+
+    def check_time(self):
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0 and (
+                self.stopped or self.deadline is not None and time.perf_counter() >= self.deadline):
+            raise SearchTimeout()
+
+    def stop(self):
+        # Ends a running search within TIME_CHECK_INTERVAL nodes, as if its time had run out
+        self.stopped = True
+
+    def minimax(self, depth, alpha, beta, maximizing_player, ply=1):
+        self.check_time()
+        stats = self.stats
+        winner = self.game.check_winner()
+        if depth == 0 or winner:
+            if stats is not None:
+                stats.leaves += 1
+            return self.leaf_value(winner)
+
+        key, index, entry = self.probe_table(maximizing_player)
+        hash_move = None
+        if stats is not None:
+            stats.tt_probes += 1
+        if entry is not None:
+            entry_depth, value, flag, hash_move = entry
+            if entry_depth >= depth and (flag == EXACT
+                                         or flag == LOWER_BOUND and value >= beta
+                                         or flag == UPPER_BOUND and value <= alpha):
+                if stats is not None:
+                    stats.tt_hits += 1
+                return value
+        alpha_orig, beta_orig = alpha, beta
+        best_move = None
 
         if maximizing_player:
             max_eval = -math.inf
-            for move in self.game.get_all_valid_moves():
-                if isinstance(move, int):  # "placing" phase
-                    self.game.make_move(move)
-                else:  # "moving" phase
-                    self.game.make_move(move[0], move[1])
-                eval = self.minimax(depth - 1, alpha, beta, False)
-                if isinstance(move, int):
-                    self.game.undo_move(move)
-                else:
-                    self.game.undo_move(move[0], move[1])
-                max_eval = max(max_eval, eval)
+            for move in self.ordered_moves(hash_move, ply):
+                self.apply_move(move)
+                try:
+                    eval = self.minimax(depth - 1, alpha, beta, False, ply + 1)
+                finally:
+                    self.revert_move()
+                if eval > max_eval:
+                    max_eval = eval
+                    best_move = move
                 alpha = max(alpha, eval)
                 if beta <= alpha:
+                    self.record_cutoff(move, depth, ply)
                     break
-            return max_eval
+            result = max_eval
         else:
             min_eval = math.inf
-            for move in self.game.get_all_valid_moves():
-                if isinstance(move, int):  # "placing" phase
-                    self.game.make_move(move)
-                else:  # "moving" phase
-                    self.game.make_move(move[0], move[1])
-                eval = self.minimax(depth - 1, alpha, beta, True)
-                if isinstance(move, int):
-                    self.game.undo_move(move)
-                else:
-                    self.game.undo_move(move[0], move[1])
-                min_eval = min(min_eval, eval)
+            for move in self.ordered_moves(hash_move, ply):
+                self.apply_move(move)
+                try:
+                    eval = self.minimax(depth - 1, alpha, beta, True, ply + 1)
+                finally:
+                    self.revert_move()
+                if eval < min_eval:
+                    min_eval = eval
+                    best_move = move
                 beta = min(beta, eval)
                 if beta <= alpha:
+                    self.record_cutoff(move, depth, ply)
                     break
-            return min_eval
+            result = min_eval
+
+        if result <= alpha_orig:
+            flag = UPPER_BOUND
+        elif result >= beta_orig:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.store_table(key, index, depth, result, flag, best_move)
+        return result
+
+    def leaf_value(self, winner=False):
+        # A finished game scores its result; only then the endgame database,
+        # which knows nothing of check_winner, and the evaluation
+        if winner == 'X':
+            return float(ENDGAME_WIN)
+        if winner == 'O':
+            return float(-ENDGAME_WIN)
+        if winner == 'Draw':
+            return 0.0
+        if self.endgame is not None:
+            result = self.endgame.probe(self.game)
+            if result is not None:
+                outcome, plies = result
+                if outcome == 0:
+                    return 0.0
+                # Values are from 'X's point of view; the database's from the side to move
+                value = ENDGAME_WIN - plies
+                return value if (outcome > 0) == (self.game.current_player == 'X') else -value
+        cache = self.eval_cache
+        if cache is None:
+            return self.evaluate_board()
+        key = self.evaluation_key()
+        value = cache.get(key)
+        if value is None:
+            value = self.evaluate_board()
+            cache.put(key, value)
+        return value
+
+    def evaluation_key(self):
+        # The evaluation depends on the board and, through mobility, the phase
+        return self.game.position_code() | (self.game.phase == 'moving') << 48
+
+    def new_game(self):
+        # Drops everything learned about the previous game's positions
+        self.transposition_table.clear()
+        self.killers = []
+        self.history = {}
+        if self.eval_cache is not None:
+            self.eval_cache.clear()
 
     def evaluate_board(self):
-        player_pieces = self.game.board.count('X')
-        opponent_pieces = self.game.board.count('O')
+        player_pieces = self.game.count_pieces('X')
+        opponent_pieces = self.game.count_pieces('O')
 
         player_mills = self.count_mills('X')
         opponent_mills = self.count_mills('O')
 
-        player_moves = len(self.game.get_all_valid_moves_for_player('X'))
-        opponent_moves = len(self.game.get_all_valid_moves_for_player('O'))
+        player_moves = self.game.count_valid_moves_for_player('X')
+        opponent_moves = self.game.count_valid_moves_for_player('O')
 
-        evaluation = (player_pieces - opponent_pieces) + (player_mills - opponent_mills) * 10 + (player_moves - opponent_moves) * 0.1
-
-        print(f"Evaluation: {evaluation} | Player Mills: {player_mills}, Opponent Mills: {opponent_mills}, Player Moves: {player_moves}, Opponent Moves: {opponent_moves}")
+        piece_weight, mill_weight, mobility_weight = self.weights
+        evaluation = (player_pieces - opponent_pieces) * piece_weight + (player_mills - opponent_mills) * mill_weight + (player_moves - opponent_moves) * mobility_weight
         return evaluation
 
     def count_mills(self, player):
-        mills = 0
-        mill_combinations = [
-            (0, 1, 2), (3, 4, 5), (6, 7, 8), (9, 10, 11),
-            (12, 13, 14), (15, 16, 17), (18, 19, 20), (21, 22, 23),
-            (0, 9, 21), (3, 10, 18), (6, 11, 15), (1, 4, 7),
-            (16, 19, 22), (8, 12, 17), (5, 13, 20), (2, 14, 23)
-        ]
-        for combo in mill_combinations:
-            if self.game.board[combo[0]] == self.game.board[combo[1]] == self.game.board[combo[2]] == player:
-                mills += 1
-        return mills
-
-    def find_best_move(self, depth):
+        return self.game.count_mills(player)
+
+    def find_best_move(self, depth=None, time_limit_ms=None):
+        # The move part of find_best_turn, as get_all_valid_moves gives it;
+        # the capture that goes with it is left in best_capture
+        turn = self.find_best_turn(depth, time_limit_ms)
+        if turn is None:
+            self.best_capture = None
+            return None
+        move, self.best_capture = unpack_turn(turn)
+        return move
+
+    def find_best_turn(self, depth=None, time_limit_ms=None):
+        # Fixed-depth search by default. With time_limit_ms, deepen one ply at a
+        # time (up to depth, if given) and return the best turn of the deepest
+        # iteration that finished within the budget.
+        if time_limit_ms is None and depth is None:
+            raise ValueError("find_best_move needs a depth or a time_limit_ms")
+        self.nodes = 0
+        self.principal_variation = []
+        self.completed_depth = 0
+        if self.stats is not None:
+            self.stats.start_search()
+        best_move = self.book_move()
+        if best_move is None:
+            self.transposition_table.new_search()
+            self.killers = []
+            for move in self.history:
+                self.history[move] //= 2
+            best_move = self.run_search(depth, time_limit_ms)
+        if self.stats is not None:
+            self.stats.finish_search(self.nodes, None if best_move is None else unpack_turn(best_move)[0])
+        return best_move
+
+    def book_move(self):
+        if self.opening_book is None:
+            return None
+        turn = self.opening_book.probe(self.game)
+        if turn is None or turn not in self.game.turns():
+            return None
+        self.principal_variation = [turn]
+        return turn
+
+    def run_search(self, depth, time_limit_ms):
+        if time_limit_ms is None:
+            self.deadline = None
+            return self.search_root(depth)
+
+        self.deadline = time.perf_counter() + time_limit_ms / 1000
+        max_depth = depth if depth is not None else MAX_ITERATIVE_DEPTH
         best_move = None
-        best_value = -math.inf
-        for move in self.game.get_all_valid_moves():
-            if isinstance(move, int):  # "placing" phase
-                self.game.make_move(move)
-                move_value = self.minimax(depth - 1, -math.inf, math.inf, False)
-                self.game.undo_move(move)
-            else:  # "moving" phase
-                self.game.make_move(move[0], move[1])
-                move_value = self.minimax(depth - 1, -math.inf, math.inf, False)
-                self.game.undo_move(move[0], move[1])
-            if move_value > best_value:
+        try:
+            for current_depth in range(1, max_depth + 1):
+                move = self.search_root(current_depth)
+                if move is None:
+                    break
+                best_move = move
+        except SearchTimeout:
+            pass
+        finally:
+            self.deadline = None
+        if best_move is None:
+            # Not even depth 1 finished; fall back to the best ordered move
+            moves = self.ordered_moves(None)
+            best_move = moves[0] if moves else None
+        return best_move
+
+    def root_moves(self):
+        _, _, entry = self.probe_table(self.game.current_player == 'X')
+        return self.ordered_moves(entry[3] if entry is not None else None)
+
+    def finish_root(self, depth, best_move, best_value):
+        if best_move is not None:
+            key, index = self.table_key(self.game.current_player == 'X')
+            self.store_table(key, index, depth, best_value, EXACT, best_move)
+            self.completed_depth = depth
+            self.principal_variation = self.extract_principal_variation(depth)
+            if self.stats is not None:
+                self.stats.finish_depth(depth, self.nodes)
+
+    def search_root(self, depth):
+        # Values are from 'X's point of view, so 'O' picks the lowest
+        maximizing_player = self.game.current_player == 'X'
+        best_move = None
+        best_value = -math.inf if maximizing_player else math.inf
+        for move in self.root_moves():
+            self.apply_move(move)
+            try:
+                if maximizing_player:
+                    move_value = self.minimax(depth - 1, best_value, math.inf, False)
+                else:
+                    move_value = self.minimax(depth - 1, -math.inf, best_value, True)
+            finally:
+                self.revert_move()
+            if (move_value > best_value) if maximizing_player else (move_value < best_value):
                 best_value = move_value
                 best_move = move
-            print(f"Move: {move} | Move Value: {move_value}")
-        print(f"Best Move: {best_move} | Best Value: {best_value}")
+        self.finish_root(depth, best_move, best_value)
         return best_move
+
+    def extract_principal_variation(self, depth):
+        # Follow the stored best moves from the root, then put the board back
+        line = []
+        for _ in range(depth):
+            _, _, entry = self.probe_table(self.game.current_player == 'X')
+            if entry is None or entry[3] is None or entry[3] not in self.game.turns():
+                break
+            self.apply_move(entry[3])
+            line.append(entry[3])
+        for _ in line:
+            self.revert_move()
+        return line
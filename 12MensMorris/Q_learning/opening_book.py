@@ -0,0 +1,134 @@
+# opening_book.py
+
+# Precomputed best moves for the first placements. The builder walks the
+# placing phase breadth-first up to a number of plies, keeping one position
+# per symmetry class, and searches each position deeply. The book is one
+# sorted .npy array of (key, move) records, loaded memory-mapped and probed
+# with a binary search. Keys are the canonical position code (see
+# symmetry.py) plus the side to move and the number of placements, and moves
+# are stored as whole packed turns (see board.pack_turn) in the canonical
+# frame, so a move that closes a mill keeps the capture the search chose.
+#
+#     python opening_book.py --plies 4 --depth 5
+
+import argparse
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from bitboard_game import BitboardMorrisGame
+from minimax import MinimaxAlgorithm, load_weights
+from symmetry import canonical_code, restore_turn, transform_turn
+
+BOOK_FILE = 'opening_book.npy'
+RECORD_DTYPE = np.dtype([('key', '<u8'), ('turn', '<u2')])
+
+
+def book_key(code, current_player, moves_made):
+    # Returns (key, symmetry index) for a position given by its packed code
+    canonical, index, _ = canonical_code(code)
+    side = 1 if current_player == 'O' else 0
+    return canonical | side << 48 | moves_made << 49, index
+
+
+class OpeningBook:
+    def __init__(self, records=None):
+        self.records = records if records is not None else np.empty(0, dtype=RECORD_DTYPE)
+        self.keys = self.records['key']
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def probe(self, game):
+        # The book turn for the game's position, or None
+        if game.phase != 'placing' or not len(self.records):
+            return None
+        key, index = book_key(game.position_code(), game.current_player, game.moves_made)
+        position = int(np.searchsorted(self.keys, np.uint64(key)))
+        if position == len(self.keys) or int(self.keys[position]) != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return restore_turn(index, int(self.records['turn'][position]))
+
+    def save(self, path=BOOK_FILE):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, self.records)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=BOOK_FILE, mmap_mode='r'):
+        return cls(np.load(path, mmap_mode=mmap_mode))
+
+    @classmethod
+    def from_entries(cls, entries):
+        # entries maps key -> canonical turn
+        records = np.empty(len(entries), dtype=RECORD_DTYPE)
+        for i, key in enumerate(sorted(entries)):
+            records[i] = (key, entries[key])
+        return cls(records)
+
+
+def load_book(path=BOOK_FILE):
+    # None when no book has been built
+    return OpeningBook.load(path) if os.path.exists(path) else None
+
+
+def book_positions(plies):
+    # One game per symmetry class of the positions reachable by placements
+    # that do not form a mill, up to plies placements; yields (key, index, game)
+    frontier = [BitboardMorrisGame()]
+    seen = set()
+    for ply in range(plies):
+        next_frontier = []
+        for game in frontier:
+            key, index = book_key(game.position_code(), game.current_player, game.moves_made)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield key, index, game
+            if ply + 1 == plies:
+                continue
+            for move in game.get_all_valid_moves():
+                if game.forms_mill(move):
+                    continue
+                child = game.copy()
+                child.make_move(move)
+                next_frontier.append(child)
+        frontier = next_frontier
+
+
+def search_position(game, index, depth, weights):
+    turn = MinimaxAlgorithm(game, weights=weights).find_best_turn(depth)
+    return None if turn is None else transform_turn(index, turn)
+
+
+def build_book(plies=4, depth=5, workers=None, weights=None):
+    positions = list(book_positions(plies))
+    tasks = [(game, index, depth, weights) for _, index, game in positions]
+    with multiprocessing.Pool(workers) as pool:
+        turns = pool.starmap(search_position, tasks, chunksize=max(1, len(tasks) // (8 * (workers or os.cpu_count()))))
+    return OpeningBook.from_entries({key: turn for (key, _, _), turn in zip(positions, turns) if turn is not None})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the placing-phase opening book")
+    parser.add_argument('--plies', type=int, default=4, help='book positions up to this many placements')
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=BOOK_FILE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    book = build_book(args.plies, args.depth, args.workers, load_weights())
+    book.save(args.output)
+    print(f"Saved {len(book)} positions to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
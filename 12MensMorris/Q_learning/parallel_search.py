@@ -0,0 +1,114 @@
+# parallel_search.py
+
+import copy
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from endgame_db import EndgameDatabase
+from minimax import MinimaxAlgorithm, SearchTimeout
+from search_stats import SearchStats
+from transposition import TranspositionTable
+
+# Each root move gets a fresh, small table so its value does not depend on
+# which other moves happened to run in the same worker before it
+WORKER_TABLE_ENTRIES = 1 << 16
+
+# Endgame databases opened by this worker process, by directory
+worker_endgames = {}
+
+
+def search_root_move(game, move, depth, bound, time_limit_ms, symmetric_cache, weights=None, endgame_directory=None):
+    # Runs in a worker process on its own unpickled copy of the game; bound is
+    # the value the move has to beat for the side to move at the root. The
+    # endgame database is reopened from its directory rather than pickled.
+    stats = SearchStats()
+    endgame = None
+    if endgame_directory is not None:
+        if endgame_directory not in worker_endgames:
+            worker_endgames[endgame_directory] = EndgameDatabase(endgame_directory)
+        endgame = worker_endgames[endgame_directory]
+    minimax = MinimaxAlgorithm(game, TranspositionTable(max_entries=WORKER_TABLE_ENTRIES), stats, symmetric_cache,
+                               weights, endgame=endgame)
+    if time_limit_ms is not None:
+        minimax.deadline = time.perf_counter() + time_limit_ms / 1000
+    maximizing_player = game.current_player == 'X'
+    minimax.apply_move(move)
+    try:
+        if maximizing_player:
+            value = minimax.minimax(depth - 1, bound, math.inf, False)
+        else:
+            value = minimax.minimax(depth - 1, -math.inf, bound, True)
+    except SearchTimeout:
+        value = None
+    counts = {'leaves': stats.leaves, 'cutoffs': stats.cutoffs, 'tt_probes': stats.tt_probes, 'tt_hits': stats.tt_hits}
+    return value, minimax.nodes, counts
+
+
+class ParallelMinimax(MinimaxAlgorithm):
+    # Young Brothers Wait at the root: the first (eldest) move is searched here
+    # to get a bound, then the remaining moves are searched in parallel against
+    # that bound. Results are merged in move order, so ties and the chosen
+    # move are the same however the workers are scheduled.
+
+    def __init__(self, game, transposition_table=None, stats=None, symmetric_cache=False, workers=None,
+                 weights=None, **kwargs):
+        # kwargs (opening_book, endgame, eval_cache) go to MinimaxAlgorithm
+        super().__init__(game, transposition_table, stats, symmetric_cache, weights, **kwargs)
+        self.workers = workers or os.cpu_count()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def snapshot(self):
+        if hasattr(self.game, 'copy'):
+            return self.game.copy()
+        return copy.deepcopy(self.game)
+
+    def search_root(self, depth):
+        moves = self.root_moves()
+        if depth < 2 or len(moves) < 2:
+            return super().search_root(depth)
+
+        maximizing_player = self.game.current_player == 'X'
+        eldest = moves[0]
+        self.apply_move(eldest)
+        try:
+            best_value = self.minimax(depth - 1, -math.inf, math.inf, not maximizing_player)
+        finally:
+            self.revert_move()
+        best_move = eldest
+
+        time_limit_ms = None
+        if self.deadline is not None:
+            time_limit_ms = max(0.0, (self.deadline - time.perf_counter()) * 1000)
+        game = self.snapshot()
+        endgame_directory = self.endgame.directory if self.endgame is not None else None
+        futures = [self.executor.submit(search_root_move, game, move, depth, best_value, time_limit_ms,
+                                         self.symmetric_cache, self.weights, endgame_directory)
+                   for move in moves[1:]]
+        try:
+            for move, future in zip(moves[1:], futures):
+                move_value, nodes, counts = future.result()
+                self.nodes += nodes
+                if self.stats is not None:
+                    self.stats.merge(counts)
+                if move_value is None:
+                    raise SearchTimeout()
+                if (move_value > best_value) if maximizing_player else (move_value < best_value):
+                    best_value = move_value
+                    best_move = move
+        finally:
+            for future in futures:
+                future.cancel()
+
+        self.finish_root(depth, best_move, best_value)
+        return best_move
@@ -0,0 +1,195 @@
+# perft.py
+
+# Counts the positions reachable in exactly N turns, where a turn is a move
+# plus, when it closes a mill, each possible capture. Every make is followed
+# by undo_move and the state is compared with a snapshot taken before the
+# move, so an inexact undo shows up as a mismatch (the state is then put back
+# from the snapshot and the walk goes on). Running both engines checks that
+# they generate the same tree:
+#
+#     python perft.py --depth 3 --engine both
+#     python perft.py --depth 4 --engine bitboard --no-verify --profile
+
+import argparse
+import cProfile
+import pstats
+import sys
+import time
+
+from benchmark import ENGINES, build_position, reference_turns
+
+STATE_FIELDS = ('board', 'current_player', 'phase', 'moves_made', 'player_pieces', 'mobility', 'hash')
+MAX_REPORTED_MISMATCHES = 10
+
+
+def snapshot(game):
+    return (tuple(game.board), game.current_player, game.phase, game.moves_made,
+            tuple(game.player_pieces.values()), tuple(game.mobility.values()), game.hash)
+
+
+def restore(game, state):
+    board, game.current_player, game.phase, game.moves_made, pieces, mobility, game.hash = state
+    if hasattr(game, 'bitboards'):
+        for player in game.players:
+            game.bitboards[player] = sum(1 << i for i, piece in enumerate(board) if piece == player)
+    else:
+        game.board[:] = board
+    game.player_pieces.update(zip(game.players, pieces))
+    game.mobility.update(zip(game.players, mobility))
+
+
+class Perft:
+    def __init__(self, game, verify=True):
+        self.game = game
+        self.verify = verify
+        self.path = []
+        self.reset()
+
+    def reset(self):
+        self.makes = 0
+        self.captures = 0
+        self.mismatches = 0
+        self.reported = []  # The first mismatches as (move path, differing fields)
+
+    def check(self, before, error=None):
+        after = snapshot(self.game)
+        if after == before and error is None:
+            return
+        self.mismatches += 1
+        if len(self.reported) < MAX_REPORTED_MISMATCHES:
+            fields = [name for name, old, new in zip(STATE_FIELDS, before, after) if old != new]
+            if error is not None:
+                fields.append(f'undo_move raised {error!r}')
+            self.reported.append((list(self.path), fields))
+        restore(self.game, before)
+
+    def make(self, move):
+        self.makes += 1
+        if isinstance(move, int):
+            return self.game.make_move(move)
+        return self.game.make_move(move[0], move[1])
+
+    def undo(self, move):
+        if isinstance(move, int):
+            self.game.undo_move(move)
+        else:
+            self.game.undo_move(move[0], move[1])
+
+    def count(self, depth):
+        # Leaf positions depth turns below the current one
+        if depth == 0:
+            return 1
+        if self.game.check_winner():
+            return 0
+        return sum(self.branch(move, depth) for move in self.game.get_all_valid_moves())
+
+    def divide(self, depth):
+        # Leaf counts below each root move
+        return {move: self.branch(move, depth) for move in self.game.get_all_valid_moves()}
+
+    def branch(self, move, depth):
+        # Leaves below one move, over every capture it allows
+        game = self.game
+        before = snapshot(game) if self.verify else None
+        result = self.make(move)
+        if not result:
+            return 0
+        self.path.append(move)
+        nodes = 0
+        targets = [None]
+        if result == 'mill':
+            opponent = game.get_opponent()
+            targets = [pos for pos in range(24) if game.board[pos] == opponent] or [None]
+        for i, target in enumerate(targets):
+            if i:
+                # Each capture is a branch of its own, so the move is made again after the undo
+                self.make(move)
+            if result == 'mill':
+                if target is not None:
+                    game.remove_opponent_piece(target)
+                    self.captures += 1
+                game.switch_player()
+            if target is not None:
+                self.path.append(('x', target))
+            nodes += self.count(depth - 1)
+            try:
+                self.undo(move)
+                error = None
+            except Exception as exception:
+                if not self.verify:
+                    raise
+                error = exception
+            if self.verify:
+                self.check(before, error)
+            if target is not None:
+                self.path.pop()
+        self.path.pop()
+        return nodes
+
+
+def run(engine, turns, depth, verify=True):
+    # Returns a dict of per-depth leaf counts, timings and undo mismatches
+    perft = Perft(build_position(engine, turns), verify)
+    results = {'engine': engine, 'depths': {}}
+    for d in range(1, depth + 1):
+        perft.reset()
+        start = time.perf_counter()
+        nodes = perft.count(d)
+        elapsed = time.perf_counter() - start
+        results['depths'][d] = {'nodes': nodes, 'makes': perft.makes, 'captures': perft.captures,
+                                'seconds': elapsed, 'nodes_per_second': perft.makes / elapsed if elapsed > 0 else 0.0,
+                                'mismatches': perft.mismatches, 'reported': perft.reported}
+    return results
+
+
+def print_results(name, results):
+    print(f"{name} ({results['engine']})")
+    for depth, row in results['depths'].items():
+        print(f"  depth {depth}: {row['nodes']:>10} leaves {row['captures']:>8} captures "
+              f"{row['seconds']:8.3f}s {row['nodes_per_second']:>10.0f} nodes/s {row['mismatches']:>8} undo mismatches")
+        for path, fields in row['reported']:
+            print(f"    after {path}: {'; '.join(fields)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft move-generation verifier")
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--engine', choices=list(ENGINES) + ['both'], default='both')
+    parser.add_argument('--positions', nargs='+', default=['start', 'placing_early', 'placing_late'],
+                        help="'start' or positions from benchmark.py")
+    parser.add_argument('--seed', type=int, default=0, help='seed of the benchmark positions')
+    parser.add_argument('--no-verify', action='store_true', help='skip the undo snapshot checks')
+    parser.add_argument('--divide', action='store_true', help='print the leaf count below each root move')
+    parser.add_argument('--profile', action='store_true', help='run under cProfile and print the costliest functions')
+    parser.add_argument('--profile-lines', type=int, default=20)
+    args = parser.parse_args()
+
+    engines = list(ENGINES) if args.engine == 'both' else [args.engine]
+    positions = reference_turns(args.seed)
+    positions['start'] = []
+    profiler = cProfile.Profile() if args.profile else None
+    failed = False
+    for name in args.positions:
+        counts = {}
+        for engine in engines:
+            if profiler is not None:
+                profiler.enable()
+            results = run(engine, positions[name], args.depth, not args.no_verify)
+            if profiler is not None:
+                profiler.disable()
+            print_results(name, results)
+            counts[engine] = [row['nodes'] for row in results['depths'].values()]
+            failed |= any(row['mismatches'] for row in results['depths'].values())
+            if args.divide:
+                for move, nodes in Perft(build_position(engine, positions[name])).divide(args.depth).items():
+                    print(f"    {move}: {nodes}")
+        if len(set(map(tuple, counts.values()))) > 1:
+            print(f"  leaf counts differ between engines: {counts}")
+            failed = True
+    if profiler is not None:
+        pstats.Stats(profiler).sort_stats('tottime').print_stats(args.profile_lines)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,15 @@ import random
 import pickle
 import os
 
+from board import ACTIONS, decode_board, encode_board
+from q_table_journal import QTableJournal
+from q_table_store import TABLE_CLASSES
+from symmetry import ACTION_PERMUTATIONS, canonical_code, transform_action
+
+ACTION_PERMUTATION_ARRAY = np.array(ACTION_PERMUTATIONS, dtype=np.intp)
+
 class QLearningAgent:
-    def __init__(self, game, alpha=0.1, gamma=0.9, epsilon=1.0, epsilon_decay=0.995, epsilon_min=0.1, q_table_file='q_table.pkl'):
+    def __init__(self, game, alpha=0.1, gamma=0.9, epsilon=1.0, epsilon_decay=0.995, epsilon_min=0.1, q_table_file='q_table.pkl', backend='dict', mmap_mode=None, journal=False, symmetry=False):
         self.game = game
         self.alpha = alpha
         self.gamma = gamma
@@ -14,31 +21,95 @@ class QLearningAgent:
         self.epsilon_decay = epsilon_decay
         self.epsilon_min = epsilon_min
         self.q_table_file = q_table_file
+        # 'dict' (pickled), 'compact' (CompactQTable, .npy) or 'dense' (DenseQTable, .npz);
+        # the batched methods below need 'dense'
+        self.backend = backend
+        self.mmap_mode = mmap_mode  # np.load mmap_mode for a 'compact' table file
+        # With journal=True, save_q_table appends only the changed entries
+        self.journal = QTableJournal(q_table_file, backend) if journal and q_table_file is not None else None
+        # With symmetry=True, Q-values are stored under the canonical rotation/reflection of each state
+        self.symmetry = symmetry
+        self.canonical_state = (None, None, 0)  # Last (state, canonical state, symmetry index)
         self.q_table = self.load_q_table()
 
     def load_q_table(self):
-        if os.path.exists(self.q_table_file):
+        if self.journal is not None:
+            return self.journal.load()
+        if self.q_table_file is not None:
+            # Pick up entries a journaling agent has not compacted yet
+            journal = QTableJournal(self.q_table_file, self.backend)
+            if journal.has_pending():
+                return journal.load()
+        if self.backend in TABLE_CLASSES:
+            table_class = TABLE_CLASSES[self.backend]
+            if self.q_table_file is not None and os.path.exists(self.q_table_file):
+                if self.backend == 'compact':
+                    return table_class.load(self.q_table_file, self.mmap_mode)
+                return table_class.load(self.q_table_file)
+            return table_class()
+        if self.q_table_file is not None and os.path.exists(self.q_table_file):
             with open(self.q_table_file, 'rb') as f:
                 return pickle.load(f)
         return {}
 
     def save_q_table(self):
-        with open(self.q_table_file, 'wb') as f:
-            pickle.dump(self.q_table, f)
+        if self.q_table_file is None:
+            return
+        if self.journal is not None:
+            self.journal.flush(self.q_table)
+            return
+        if self.backend in TABLE_CLASSES:
+            self.q_table.save(self.q_table_file)
+        else:
+            with open(self.q_table_file, 'wb') as f:
+                pickle.dump(self.q_table, f)
+        # A full save supersedes any journal left by a journaling agent
+        QTableJournal(self.q_table_file, self.backend).remove_files()
+
+    def close_q_table(self):
+        # Final save; also waits for any background journal compaction
+        self.save_q_table()
+        if self.journal is not None:
+            self.journal.close(self.q_table)
 
     def clear_q_table(self):
-        self.q_table = {}
-        if os.path.exists(self.q_table_file):
-            os.remove(self.q_table_file)
+        self.q_table = TABLE_CLASSES[self.backend]() if self.backend in TABLE_CLASSES else {}
+        if self.q_table_file is not None:
+            if os.path.exists(self.q_table_file):
+                os.remove(self.q_table_file)
+            (self.journal or QTableJournal(self.q_table_file, self.backend)).remove_files()
 
     def get_state(self):
+        if self.backend in TABLE_CLASSES:
+            return self.game.position_code()
         return tuple(self.game.board)
 
+    def state_from_code(self, code):
+        # Inverse of position_code for the dict backend, e.g. for replayed transitions
+        if self.backend in TABLE_CLASSES:
+            return code
+        return tuple(decode_board(code))
+
+    def table_key(self, state, action):
+        if not self.symmetry:
+            return state, action
+        if self.canonical_state[0] != state:
+            code = state if self.backend in TABLE_CLASSES else encode_board(state)
+            canonical, index, _ = canonical_code(code)
+            if self.backend not in TABLE_CLASSES:
+                canonical = tuple(decode_board(canonical))
+            self.canonical_state = (state, canonical, index)
+        _, canonical, index = self.canonical_state
+        return canonical, transform_action(index, action)
+
     def get_q_value(self, state, action):
-        return self.q_table.get((state, action), 0.0)
+        return self.q_table.get(self.table_key(state, action), 0.0)
 
     def set_q_value(self, state, action, value):
-        self.q_table[(state, action)] = value
+        key = self.table_key(state, action)
+        self.q_table[key] = value
+        if self.journal is not None:
+            self.journal.mark(*key)
 
     def choose_action(self, valid_moves):
         if not valid_moves:
@@ -53,12 +124,83 @@ class QLearningAgent:
             max_q_actions = [valid_moves[i] for i in range(len(valid_moves)) if q_values[i] == max_q_value]
             return random.choice(max_q_actions)
 
-    def update_q_value(self, state, action, reward, next_state, next_valid_moves):
+    def update_q_value(self, state, action, reward, next_state, next_valid_moves, weight=1.0):
+        # weight scales the step size (importance weights from prioritized replay);
+        # returns the TD error
         current_q = self.get_q_value(state, action)
         max_future_q = max([self.get_q_value(next_state, move) for move in next_valid_moves], default=0)
-        new_q = (1 - self.alpha) * current_q + self.alpha * (reward + self.gamma * max_future_q)
+        td_error = reward + self.gamma * max_future_q - current_q
+        new_q = current_q + self.alpha * weight * td_error
         self.set_q_value(state, action, new_q)
+        return td_error
 
     def decay_epsilon(self):
         if self.epsilon > self.epsilon_min:
             self.epsilon *= self.epsilon_decay
+
+    # Batched API for the 'dense' backend. States are arrays of packed position
+    # codes (BatchMorrisEnv.position_codes), legal masks and actions use the
+    # action ids from board.py (BatchMorrisEnv.legal_mask).
+
+    def batch_keys(self, states):
+        # Returns (table states, column of each action id per state)
+        if self.backend != 'dense':
+            raise ValueError("Batched Q-learning needs backend='dense'")
+        states = np.asarray(states, dtype=np.int64)
+        if not self.symmetry:
+            return states, np.broadcast_to(np.arange(len(ACTIONS)), (len(states), len(ACTIONS)))
+        canonical = [canonical_code(code) for code in states.tolist()]
+        codes = np.array([code for code, _, _ in canonical], dtype=np.int64)
+        indices = np.array([index for _, index, _ in canonical], dtype=np.intp)
+        return codes, ACTION_PERMUTATION_ARRAY[indices]
+
+    def batch_q_values(self, states):
+        # (n, NUM_ACTIONS) Q-values; unseen states are all zero
+        codes, columns = self.batch_keys(states)
+        rows = self.q_table.lookup(codes)
+        q_values = self.q_table.values[np.maximum(rows, 0)[:, None], columns]
+        q_values[rows < 0] = 0.0
+        return q_values
+
+    def batch_max_q(self, states, legal_masks):
+        # Best legal Q-value per state, 0 where nothing is legal
+        q_values = np.where(legal_masks, self.batch_q_values(states), -np.inf)
+        best = q_values.max(axis=1)
+        return np.where(np.isfinite(best), best, 0.0)
+
+    def choose_actions(self, states, legal_masks):
+        # Epsilon-greedy action id per state, ties broken at random
+        legal_masks = np.asarray(legal_masks, dtype=bool)
+        noise = np.random.random(legal_masks.shape)
+        q_values = self.batch_q_values(states)
+        best = np.where(legal_masks, q_values, -np.inf).max(axis=1)
+        greedy = np.where(legal_masks & (q_values == best[:, None]), noise, -1.0).argmax(axis=1)
+        explore = np.where(legal_masks, noise, -1.0).argmax(axis=1)
+        return np.where(np.random.random(len(legal_masks)) < self.epsilon, explore, greedy)
+
+    def batch_update(self, states, actions, rewards, next_states, next_legal_masks, dones=None, zero_sum=False,
+                     weights=None):
+        # One TD step for a whole batch of transitions; finished transitions
+        # (dones) do not bootstrap from the next state. With zero_sum the next
+        # state is the opponent's turn (self-play on BatchMorrisEnv), so its
+        # best value counts against the mover. weights scale each step as in
+        # update_q_value. Returns the TD errors.
+        future = self.batch_max_q(next_states, next_legal_masks)
+        if zero_sum:
+            future = -future
+        if dones is not None:
+            future = np.where(dones, 0.0, future)
+        targets = np.asarray(rewards, dtype=np.float32) + self.gamma * future
+        actions = np.asarray(actions, dtype=np.intp)
+        codes, columns = self.batch_keys(states)
+        columns = columns[np.arange(len(actions)), actions]
+        rows = self.q_table.lookup(codes, create=True)
+        values = self.q_table.values
+        td_errors = targets - values[rows, columns]
+        steps = self.alpha * td_errors if weights is None else self.alpha * weights * td_errors
+        # Repeated (state, action) pairs in one batch add up their updates
+        np.add.at(values, (rows, columns), steps)
+        if self.journal is not None:
+            for code, column in zip(codes.tolist(), columns.tolist()):
+                self.journal.mark(code, ACTIONS[column])
+        return td_errors
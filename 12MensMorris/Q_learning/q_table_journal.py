@@ -0,0 +1,162 @@
+# q_table_journal.py
+
+# Append-only persistence for QLearningAgent. Changed entries are appended to
+# '<q_table_file>.journal' as fixed-size (key, value) records on each flush,
+# so a checkpoint costs O(changed entries). A background thread folds the
+# journal into a fresh snapshot once it grows past a fraction of the table and
+# swaps it in with an atomic rename. Loading reads the snapshot and replays
+# any journal left behind; replay is idempotent because records hold values,
+# not deltas.
+
+import os
+import pickle
+import threading
+
+import numpy as np
+
+from board import decode_board, encode_board
+from q_table_store import TABLE_CLASSES, pack_key, unpack_key
+
+# Values are kept as float64 so replaying a dict-backed table is exact
+RECORD_DTYPE = np.dtype([('key', '<u8'), ('value', '<f8')])
+
+# Compact once the journal holds this many records per table entry
+COMPACT_RATIO = 0.5
+# ...but never for journals smaller than this
+MIN_COMPACT_RECORDS = 10000
+
+
+def fsync_directory(path):
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class QTableJournal:
+    def __init__(self, q_table_file, backend='dict', compact_ratio=COMPACT_RATIO,
+                 min_compact_records=MIN_COMPACT_RECORDS, background=True):
+        self.q_table_file = q_table_file
+        self.journal_file = q_table_file + '.journal'
+        self.compacting_file = q_table_file + '.journal.compacting'
+        self.backend = backend
+        self.compact_ratio = compact_ratio
+        self.min_compact_records = min_compact_records
+        self.background = background
+        self.dirty = set()
+        self.journal_records = 0
+        self.lock = threading.Lock()
+        self.compactor = None
+
+    def state_code(self, state):
+        return encode_board(state) if self.backend == 'dict' else state
+
+    def has_pending(self):
+        return os.path.exists(self.journal_file) or os.path.exists(self.compacting_file)
+
+    def load(self):
+        if self.backend in TABLE_CLASSES:
+            table_class = TABLE_CLASSES[self.backend]
+            q_table = table_class.load(self.q_table_file) if os.path.exists(self.q_table_file) else table_class()
+        elif os.path.exists(self.q_table_file):
+            with open(self.q_table_file, 'rb') as f:
+                q_table = pickle.load(f)
+        else:
+            q_table = {}
+        for path in (self.compacting_file, self.journal_file):
+            if os.path.exists(path):
+                records = self.read_records(path)
+                self.replay(q_table, records)
+                if path == self.journal_file:
+                    self.journal_records = len(records)
+        return q_table
+
+    def read_records(self, path):
+        # A crash mid-append can leave a partial record at the end; ignore it
+        count = os.path.getsize(path) // RECORD_DTYPE.itemsize
+        return np.fromfile(path, dtype=RECORD_DTYPE, count=count)
+
+    def replay(self, q_table, records):
+        for key, value in zip(records['key'].tolist(), records['value'].tolist()):
+            state, action = unpack_key(key)
+            if self.backend == 'dict':
+                state = tuple(decode_board(state))
+            q_table[(state, action)] = value
+
+    def mark(self, state, action):
+        self.dirty.add((state, action))
+
+    def flush(self, q_table):
+        with self.lock:
+            if self.dirty:
+                records = np.empty(len(self.dirty), dtype=RECORD_DTYPE)
+                for i, (state, action) in enumerate(self.dirty):
+                    records[i] = (pack_key(self.state_code(state), action), q_table.get((state, action), 0.0))
+                with open(self.journal_file, 'ab') as f:
+                    records.tofile(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.journal_records += len(records)
+                self.dirty.clear()
+            due = self.journal_records >= max(self.min_compact_records, self.compact_ratio * len(q_table))
+        if due:
+            self.compact(q_table)
+
+    def compact(self, q_table, wait=False):
+        if self.compactor is not None and self.compactor.is_alive():
+            if not wait:
+                return
+            self.compactor.join()
+        with self.lock:
+            if os.path.exists(self.compacting_file):
+                # An earlier compaction did not finish; fold it in first
+                self.write_snapshot(self.copy_table(q_table))
+                os.remove(self.compacting_file)
+            snapshot = self.copy_table(q_table)
+            if os.path.exists(self.journal_file):
+                os.replace(self.journal_file, self.compacting_file)
+            self.journal_records = 0
+        if self.background and not wait:
+            self.compactor = threading.Thread(target=self.finish_compaction, args=(snapshot,), daemon=True)
+            self.compactor.start()
+        else:
+            self.finish_compaction(snapshot)
+
+    def copy_table(self, q_table):
+        if self.backend in TABLE_CLASSES:
+            return q_table.snapshot()
+        return dict(q_table)
+
+    def finish_compaction(self, snapshot):
+        self.write_snapshot(snapshot)
+        if os.path.exists(self.compacting_file):
+            os.remove(self.compacting_file)
+
+    def write_snapshot(self, snapshot):
+        tmp_path = self.q_table_file + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            if self.backend in TABLE_CLASSES:
+                snapshot.write(f)
+            else:
+                pickle.dump(snapshot, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.q_table_file)
+        fsync_directory(self.q_table_file)
+
+    def close(self, q_table):
+        self.flush(q_table)
+        if self.compactor is not None:
+            self.compactor.join()
+
+    def remove_files(self):
+        for path in (self.journal_file, self.compacting_file):
+            if os.path.exists(path):
+                os.remove(path)
+        self.dirty.clear()
+        self.journal_records = 0
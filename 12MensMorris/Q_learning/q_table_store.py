@@ -0,0 +1,282 @@
+# q_table_store.py
+
+import os
+import pickle
+
+import numpy as np
+
+from board import ACTION_IDS, ACTIONS, NUM_ACTIONS, encode_board
+
+EMPTY_KEY = 0xFFFFFFFFFFFFFFFF
+EMPTY = np.uint64(EMPTY_KEY)
+ACTION_BITS = 7  # NUM_ACTIONS fits in 7 bits, packed positions in 48
+FIBONACCI = 0x9E3779B97F4A7C15
+MASK_64 = (1 << 64) - 1
+MAX_LOAD = 0.7
+
+
+def pack_key(state, action):
+    # state is a packed position (see board.encode_board); action a square or (from, to)
+    return state << ACTION_BITS | ACTION_IDS[action]
+
+
+def unpack_key(key):
+    return key >> ACTION_BITS, ACTIONS[key & ((1 << ACTION_BITS) - 1)]
+
+
+def empty_slots(size):
+    slots = np.empty(size + size // 2, dtype=np.uint64)
+    slots[:size] = EMPTY
+    slots[size:] = 0
+    return slots
+
+
+class CompactQTable:
+    # Open-addressed (linear probing) table of uint64 keys and float32 values
+    # held in one uint64 NumPy array (the keys, then the values two to a word),
+    # so it can be saved as a single .npy file and memory-mapped back. Keys
+    # are (state, action) pairs as used by QLearningAgent, with the state given
+    # as a packed position int. Single lookups go through memoryviews of the
+    # two halves, which index to plain Python ints and floats.
+
+    def __init__(self, capacity=1 << 16, slots=None):
+        if slots is None:
+            size = 16
+            while size * MAX_LOAD < capacity:
+                size *= 2
+            slots = empty_slots(size)
+        self.set_slots(slots)
+        self.count = int(np.count_nonzero(self.keys != EMPTY))
+
+    def set_slots(self, slots):
+        self.slots = slots
+        self.size = len(slots) * 2 // 3
+        self.keys = slots[:self.size]
+        self.values = slots[self.size:].view(np.float32)
+        self.key_view = memoryview(self.keys)
+        self.value_view = memoryview(self.values)
+        self.mask = self.size - 1
+        self.shift = 64 - (self.size.bit_length() - 1)
+
+    def find(self, key):
+        # Returns (slot, found)
+        keys = self.key_view
+        mask = self.mask
+        slot = ((key * FIBONACCI) & MASK_64) >> self.shift
+        while True:
+            stored = keys[slot]
+            if stored == key:
+                return slot, True
+            if stored == EMPTY_KEY:
+                return slot, False
+            slot = (slot + 1) & mask
+
+    def get(self, state_action, default=0.0):
+        # find and pack_key inlined, since this is the agent's hot path
+        state, action = state_action
+        key = state << ACTION_BITS | ACTION_IDS[action]
+        keys = self.key_view
+        mask = self.mask
+        slot = ((key * FIBONACCI) & MASK_64) >> self.shift
+        while True:
+            stored = keys[slot]
+            if stored == key:
+                return self.value_view[slot]
+            if stored == EMPTY_KEY:
+                return default
+            slot = (slot + 1) & mask
+
+    def __getitem__(self, state_action):
+        slot, found = self.find(pack_key(*state_action))
+        if not found:
+            raise KeyError(state_action)
+        return self.value_view[slot]
+
+    def __setitem__(self, state_action, value):
+        key = pack_key(*state_action)
+        slot, found = self.find(key)
+        if not found:
+            if (self.count + 1) > self.size * MAX_LOAD:
+                self.resize(self.size * 2)
+                slot, _ = self.find(key)
+            self.key_view[slot] = key
+            self.count += 1
+        self.value_view[slot] = value
+
+    def __contains__(self, state_action):
+        return self.find(pack_key(*state_action))[1]
+
+    def __len__(self):
+        return self.count
+
+    def items(self):
+        used = self.keys != EMPTY
+        for key, value in zip(self.keys[used].tolist(), self.values[used].tolist()):
+            yield unpack_key(key), value
+
+    def resize(self, size):
+        used = self.keys != EMPTY
+        keys = self.keys[used]
+        values = self.values[used]
+        self.set_slots(empty_slots(size))
+        self.count = 0
+        self.insert_many(keys, values)
+
+    def insert_many(self, keys, values):
+        # Vectorised insert of keys known to be absent: every pending key tries
+        # the next slot of its probe sequence each round, and one key wins each
+        # free slot
+        shift = np.uint64(self.shift)
+        home = ((keys * np.uint64(FIBONACCI)) >> shift).astype(np.int64)
+        pending = np.arange(len(keys))
+        offset = 0
+        while pending.size:
+            slots = (home[pending] + offset) & self.mask
+            free = self.keys[slots] == EMPTY
+            free_slots, first = np.unique(slots[free], return_index=True)
+            winners = pending[free][first]
+            self.keys[free_slots] = keys[winners]
+            self.values[free_slots] = values[winners]
+            placed = np.zeros(len(keys), dtype=bool)
+            placed[winners] = True
+            pending = pending[~placed[pending]]
+            offset += 1
+        self.count += len(keys)
+
+    def snapshot(self):
+        return CompactQTable(slots=self.slots.copy())
+
+    def write(self, f):
+        np.save(f, self.slots)
+
+    def save(self, path):
+        # Written through a handle so NumPy does not append '.npy' to the name
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            self.write(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        # mmap_mode='r' maps the file read-only, 'r+' allows in-place updates
+        # until the table has to grow
+        return cls(slots=np.load(path, mmap_mode=mmap_mode))
+
+    @classmethod
+    def from_dict(cls, q_table):
+        # Converts a QLearningAgent dict keyed by (board tuple, action)
+        table = cls(capacity=len(q_table))
+        keys = np.fromiter((pack_key(encode_board(state), action) for state, action in q_table),
+                           dtype=np.uint64, count=len(q_table))
+        values = np.fromiter(q_table.values(), dtype=np.float32, count=len(q_table))
+        table.insert_many(keys, values)
+        return table
+
+
+class DenseQTable:
+    # One float32 row of NUM_ACTIONS values per state, rows in the order the
+    # states were first seen, with a dict from state (packed position int) to
+    # row. The row buffers double when full, so adding states costs amortised
+    # O(1). Supports the same get/__setitem__ calls as the dict backend plus
+    # vectorised row access for batched training.
+
+    def __init__(self, capacity=1024):
+        self.index = {}  # State code -> row
+        self.keys = np.empty(capacity, dtype=np.int64)  # State code of each row
+        self.set_values(np.zeros((capacity, NUM_ACTIONS), dtype=np.float32))
+        self.count = 0
+
+    def set_values(self, values):
+        self.values = values
+        self.value_view = memoryview(values.reshape(-1))  # Flat, for single entries as Python floats
+
+    def lookup(self, states, create=False):
+        # Row index per state, or -1 for unseen states unless create is set
+        states = np.asarray(states, dtype=np.int64)
+        codes = states.ravel().tolist()
+        index = self.index
+        if create:
+            new_states = [state for state in dict.fromkeys(codes) if state not in index]
+            if new_states:
+                self.add_states(new_states)
+        rows = np.fromiter((index.get(state, -1) for state in codes), dtype=np.int64, count=len(codes))
+        return rows.reshape(states.shape)
+
+    def add_states(self, new_states):
+        # new_states: state codes not in the table yet
+        start = self.count
+        self.count += len(new_states)
+        if self.count > len(self.keys):
+            size = max(len(self.keys), 1)
+            while size < self.count:
+                size *= 2
+            keys = np.empty(size, dtype=np.int64)
+            keys[:start] = self.keys[:start]
+            self.keys = keys
+            values = np.zeros((size, NUM_ACTIONS), dtype=np.float32)
+            values[:start] = self.values[:start]
+            self.set_values(values)
+        self.keys[start:self.count] = new_states
+        self.index.update(zip(new_states, range(start, self.count)))
+
+    def q_rows(self, states):
+        # (n, NUM_ACTIONS) values; unseen states read as zeros
+        rows = self.lookup(states)
+        result = self.values[np.maximum(rows, 0)]
+        result[rows < 0] = 0.0
+        return result
+
+    def get(self, state_action, default=0.0):
+        state, action = state_action
+        row = self.index.get(state)
+        if row is None:
+            return default
+        return self.value_view[row * NUM_ACTIONS + ACTION_IDS[action]]
+
+    def __setitem__(self, state_action, value):
+        state, action = state_action
+        row = self.index.get(state)
+        if row is None:
+            row = self.count
+            self.add_states([state])
+        self.value_view[row * NUM_ACTIONS + ACTION_IDS[action]] = value
+
+    def __len__(self):
+        return self.count
+
+    def items(self):
+        for row, state in enumerate(self.keys[:self.count].tolist()):
+            for action_id in np.flatnonzero(self.values[row]).tolist():
+                yield (state, ACTIONS[action_id]), float(self.values[row, action_id])
+
+    def snapshot(self):
+        table = DenseQTable(capacity=max(self.count, 1))
+        table.add_states(self.keys[:self.count].tolist())
+        table.values[:self.count] = self.values[:self.count]
+        return table
+
+    def write(self, f):
+        np.savez(f, keys=self.keys[:self.count], values=self.values[:self.count])
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            self.write(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            table = cls(capacity=max(len(data['values']), 1))
+            table.add_states(data['keys'].tolist())
+            table.values[:table.count] = data['values']
+        return table
+
+
+TABLE_CLASSES = {'compact': CompactQTable, 'dense': DenseQTable}
+
+
+def convert_pickle(pickle_path, output_path):
+    with open(pickle_path, 'rb') as f:
+        q_table = pickle.load(f)
+    CompactQTable.from_dict(q_table).save(output_path)
@@ -0,0 +1,115 @@
+# replay_buffer.py
+
+# Fixed-size experience replay for the Q-learning trainers. Transitions are
+# kept in preallocated NumPy arrays used as a ring: once full, the oldest
+# transition is overwritten. States are packed position codes (see
+# board.encode_board), actions are action ids and next_masks mark the legal
+# action ids in the next state. Given a directory, the arrays are memmapped
+# .npy files there instead, so the buffer survives restarts and does not
+# have to fit in RAM.
+
+import os
+
+import numpy as np
+
+from board import NUM_ACTIONS
+
+FIELDS = (
+    ('states', np.int64, ()),
+    ('actions', np.int16, ()),
+    ('rewards', np.float32, ()),
+    ('next_states', np.int64, ()),
+    ('dones', np.bool_, ()),
+    ('next_masks', np.bool_, (NUM_ACTIONS,)),
+    ('priorities', np.float32, ()),
+)
+
+
+class ReplayBuffer:
+    def __init__(self, capacity, path=None, alpha=0.6, epsilon=1e-3):
+        # alpha is how strongly prioritized sampling follows the priorities
+        # (0 is uniform); epsilon keeps zero-error transitions sampleable
+        self.capacity = capacity
+        self.path = path
+        self.alpha = alpha
+        self.epsilon = epsilon
+        if path is None:
+            self.arrays = {name: np.zeros((capacity,) + shape, dtype=dtype) for name, dtype, shape in FIELDS}
+            self.meta = np.zeros(2, dtype=np.int64)
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.arrays = {name: self.open_array(name, dtype, (capacity,) + shape) for name, dtype, shape in FIELDS}
+            self.meta = self.open_array('meta', np.int64, (2,))
+        # meta holds (next write position, number of stored transitions)
+        self.max_priority = float(self.arrays['priorities'][:len(self)].max(initial=1.0))
+
+    def open_array(self, name, dtype, shape):
+        file_name = os.path.join(self.path, name + '.npy')
+        if os.path.exists(file_name):
+            array = np.load(file_name, mmap_mode='r+')
+            if array.shape != shape or array.dtype != dtype:
+                raise ValueError(f"{file_name} does not match a buffer of capacity {self.capacity}")
+            return array
+        return np.lib.format.open_memmap(file_name, mode='w+', dtype=dtype, shape=shape)
+
+    def __len__(self):
+        return int(self.meta[1])
+
+    def add(self, state, action, reward, next_state, done, next_mask):
+        self.add_batch([state], [action], [reward], [next_state], [done], [next_mask])
+
+    def add_batch(self, states, actions, rewards, next_states, dones, next_masks):
+        count = len(states)
+        if count > self.capacity:
+            # Only the newest transitions would survive anyway
+            keep = slice(count - self.capacity, count)
+            states, actions, rewards = states[keep], actions[keep], rewards[keep]
+            next_states, dones, next_masks = next_states[keep], dones[keep], next_masks[keep]
+            count = self.capacity
+        position = int(self.meta[0])
+        indices = (position + np.arange(count)) % self.capacity
+        arrays = self.arrays
+        arrays['states'][indices] = states
+        arrays['actions'][indices] = actions
+        arrays['rewards'][indices] = rewards
+        arrays['next_states'][indices] = next_states
+        arrays['dones'][indices] = dones
+        arrays['next_masks'][indices] = next_masks
+        # New transitions are replayed at least once with the highest priority
+        arrays['priorities'][indices] = self.max_priority
+        self.meta[0] = (position + count) % self.capacity
+        self.meta[1] = min(self.capacity, len(self) + count)
+
+    def sample(self, batch_size, prioritized=False, beta=0.4):
+        # Returns (indices, (states, actions, rewards, next_states, dones,
+        # next_masks), weights). Prioritized sampling draws in proportion to
+        # priority ** alpha; the weights undo that bias with strength beta and
+        # are all 1 for uniform sampling.
+        size = len(self)
+        if size == 0:
+            raise ValueError("Cannot sample from an empty replay buffer")
+        if prioritized:
+            scaled = self.arrays['priorities'][:size].astype(np.float64) ** self.alpha
+            cumulative = np.cumsum(scaled)
+            indices = np.searchsorted(cumulative, np.random.random(batch_size) * cumulative[-1], side='right')
+            indices = np.minimum(indices, size - 1)
+            weights = (size * scaled[indices] / cumulative[-1]) ** -beta
+            weights = (weights / weights.max()).astype(np.float32)
+        else:
+            indices = np.random.randint(0, size, batch_size)
+            weights = np.ones(batch_size, dtype=np.float32)
+        arrays = self.arrays
+        batch = (arrays['states'][indices], arrays['actions'][indices].astype(np.intp), arrays['rewards'][indices],
+                 arrays['next_states'][indices], arrays['dones'][indices], arrays['next_masks'][indices])
+        return indices, batch, weights
+
+    def update_priorities(self, indices, td_errors):
+        priorities = np.abs(np.asarray(td_errors, dtype=np.float32)) + self.epsilon
+        self.arrays['priorities'][indices] = priorities
+        self.max_priority = max(self.max_priority, float(priorities.max(initial=0.0)))
+
+    def flush(self):
+        if self.path is not None:
+            for array in self.arrays.values():
+                array.flush()
+            self.meta.flush()
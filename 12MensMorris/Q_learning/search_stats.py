@@ -0,0 +1,87 @@
+# search_stats.py
+
+import json
+import time
+
+
+class SearchStats:
+    # Opt-in counters for MinimaxAlgorithm. Pass an instance as
+    # MinimaxAlgorithm(game, stats=SearchStats()) and read it after each
+    # find_best_move, or give it a log_file to append one JSON line per search.
+
+    def __init__(self, log_file=None):
+        self.log_file = log_file
+        self.searches = 0
+        self.reset()
+
+    def reset(self):
+        self.nodes = 0
+        self.leaves = 0
+        self.cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.depth_times = {}  # depth -> seconds spent on that iteration
+        self.depth_nodes = {}  # depth -> nodes searched in that iteration
+        self.best_move = None
+        self.completed_depth = 0
+        self.start_time = time.perf_counter()
+        self.elapsed = 0.0
+        self.iteration_start = self.start_time
+        self.iteration_nodes = 0
+
+    def start_search(self):
+        self.reset()
+        self.searches += 1
+
+    def finish_depth(self, depth, nodes):
+        now = time.perf_counter()
+        self.depth_times[depth] = now - self.iteration_start
+        self.depth_nodes[depth] = nodes - self.iteration_nodes
+        self.completed_depth = depth
+        self.iteration_start = now
+        self.iteration_nodes = nodes
+
+    def finish_search(self, nodes, best_move):
+        self.nodes = nodes
+        self.best_move = best_move
+        self.elapsed = time.perf_counter() - self.start_time
+        if self.log_file is not None:
+            with open(self.log_file, 'a') as f:
+                f.write(json.dumps(self.as_dict()) + '\n')
+
+    def merge(self, counts):
+        # Adds counters reported by a worker process
+        self.leaves += counts['leaves']
+        self.cutoffs += counts['cutoffs']
+        self.tt_probes += counts['tt_probes']
+        self.tt_hits += counts['tt_hits']
+
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def branching_factor(self):
+        # Effective branching factor: growth in nodes between the two deepest
+        # iterations, or the average number of children per interior node for
+        # a single fixed-depth search
+        depths = sorted(self.depth_nodes)
+        if len(depths) >= 2 and self.depth_nodes[depths[-2]] > 0:
+            return self.depth_nodes[depths[-1]] / self.depth_nodes[depths[-2]]
+        interior = self.nodes - self.leaves
+        return (self.nodes - 1) / interior if interior > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            'search': self.searches,
+            'best_move': self.best_move,
+            'completed_depth': self.completed_depth,
+            'nodes': self.nodes,
+            'leaves': self.leaves,
+            'cutoffs': self.cutoffs,
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'elapsed': self.elapsed,
+            'nodes_per_second': self.nodes_per_second(),
+            'branching_factor': self.branching_factor(),
+            'depth_times': {str(depth): seconds for depth, seconds in self.depth_times.items()},
+            'depth_nodes': {str(depth): nodes for depth, nodes in self.depth_nodes.items()},
+        }
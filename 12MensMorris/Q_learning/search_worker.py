@@ -0,0 +1,61 @@
+# search_worker.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+from bitboard_game import BitboardMorrisGame
+from board import unpack_turn
+from minimax import SearchTimeout
+
+
+class SearchWorker:
+    # Runs MinimaxAlgorithm.find_best_turn in a background thread so a Tk app
+    # keeps handling events while the computer thinks. The UI thread starts a
+    # search, then polls done(), progress() and result() from root.after
+    # callbacks. The search works on a bitboard copy of the game, so the UI's
+    # own game is never touched while it runs.
+
+    def __init__(self, minimax):
+        self.minimax = minimax
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+
+    def start(self, game, depth=None, time_limit_ms=None):
+        self.cancel()
+        self.minimax.game = BitboardMorrisGame.from_game(game)
+        self.minimax.stopped = False
+        self.future = self.executor.submit(self.search, depth, time_limit_ms)
+
+    def search(self, depth, time_limit_ms):
+        try:
+            return self.minimax.find_best_turn(depth, time_limit_ms)
+        except SearchTimeout:
+            return None
+
+    def cancel(self):
+        # Stops the running search, if any, and waits the few milliseconds it takes to unwind
+        if self.future is None:
+            return
+        self.minimax.stop()
+        self.future.exception()
+        self.future = None
+
+    def running(self):
+        return self.future is not None
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def result(self):
+        # The best turn of the finished search (None if there was none) and forgets the search
+        turn = self.future.result()
+        self.future = None
+        return turn
+
+    def progress(self):
+        # (deepest completed depth, its best move and capture or None) of the running search
+        line = self.minimax.principal_variation
+        return self.minimax.completed_depth, unpack_turn(line[0]) if line else None
+
+    def close(self):
+        self.cancel()
+        self.executor.shutdown()
@@ -0,0 +1,133 @@
+# symmetry.py
+
+# The board is unchanged by the eight rotations/reflections of the square and
+# by swapping the inner and outer rings, giving 16 square permutations. Every
+# candidate below is checked against MILLS and ADJACENCY, so only real
+# symmetries end up in SYMMETRIES. Swapping colours ('X' <-> 'O') is a further,
+# optional symmetry; it flips whose point of view a value is from, so callers
+# that use it get a 'swapped' flag back and must negate values themselves.
+
+from board import ACTION_IDS, ACTIONS, ADJACENCY, COORDINATES, MILLS, NO_SQUARE
+
+_SQUARE_AT = {coord: i for i, coord in enumerate(COORDINATES)}
+
+
+def _grid_maps():
+    maps = []
+    for rotation in range(4):
+        for reflect in (False, True):
+            for ring_swap in (False, True):
+                def transform(row, col, rotation=rotation, reflect=reflect, ring_swap=ring_swap):
+                    dr, dc = row - 3, col - 3
+                    if ring_swap:
+                        ring = max(abs(dr), abs(dc))
+                        if ring == 1:
+                            dr, dc = dr * 3, dc * 3
+                        elif ring == 3:
+                            dr, dc = dr // 3, dc // 3
+                    if reflect:
+                        dc = -dc
+                    for _ in range(rotation):
+                        dr, dc = dc, -dr
+                    return dr + 3, dc + 3
+                maps.append(transform)
+    return maps
+
+
+def _is_symmetry(perm):
+    mills = {frozenset(m) for m in MILLS}
+    if {frozenset(perm[i] for i in m) for m in MILLS} != mills:
+        return False
+    edges = {frozenset((a, b)) for a in range(24) for b in ADJACENCY[a]}
+    return {frozenset((perm[a], perm[b])) for a, b in map(tuple, edges)} == edges
+
+
+def _build_symmetries():
+    found = []
+    for transform in _grid_maps():
+        perm = tuple(_SQUARE_AT[transform(*COORDINATES[i])] for i in range(24))
+        if perm not in found and _is_symmetry(perm):
+            found.append(perm)
+    return tuple(found)
+
+
+SYMMETRIES = _build_symmetries()  # SYMMETRIES[0] is the identity
+INVERSES = tuple(tuple(perm.index(i) for i in range(24)) for perm in SYMMETRIES)
+INVERSE_INDEX = tuple(SYMMETRIES.index(inverse) for inverse in INVERSES)
+
+
+def _mask_tables(perm, offset):
+    return tuple(sum(1 << perm[i + offset] for i in range(12) if m >> i & 1) for m in range(1 << 12))
+
+
+# Per symmetry, lookup tables that permute the low and high 12 bits of a mask
+_LOW_TABLES = tuple(_mask_tables(perm, 0) for perm in SYMMETRIES)
+_HIGH_TABLES = tuple(_mask_tables(perm, 12) for perm in SYMMETRIES)
+
+
+def transform_mask(index, mask):
+    return _LOW_TABLES[index][mask & 0xFFF] | _HIGH_TABLES[index][mask >> 12]
+
+
+def transform_code(index, code):
+    # code is a packed position as produced by board.encode_board
+    return transform_mask(index, code & 0xFFFFFF) | transform_mask(index, code >> 24) << 24
+
+
+def swap_colours(code):
+    return code >> 24 | (code & 0xFFFFFF) << 24
+
+
+def transform_action(index, action):
+    perm = SYMMETRIES[index]
+    if isinstance(action, int):
+        return perm[action]
+    return (perm[action[0]], perm[action[1]])
+
+
+# ACTION_PERMUTATIONS[index][action_id] is the id of the transformed action
+ACTION_PERMUTATIONS = tuple(tuple(ACTION_IDS[transform_action(index, action)] for action in ACTIONS)
+                            for index in range(len(SYMMETRIES)))
+
+
+def restore_action(index, action):
+    # Maps an action on the canonical board back onto the original board
+    return transform_action(INVERSE_INDEX[index], action)
+
+
+# The square permutations extended to the 5-bit fields of a packed turn
+_TURN_PERMUTATIONS = tuple(perm + (None,) * (NO_SQUARE - 24) + (NO_SQUARE,) for perm in SYMMETRIES)
+
+
+def transform_turn(index, turn):
+    # Same as transform_action for a packed turn (see board.pack_turn)
+    perm = _TURN_PERMUTATIONS[index]
+    return perm[turn & 31] | perm[turn >> 5 & 31] << 5 | perm[turn >> 10] << 10
+
+
+def restore_turn(index, turn):
+    return transform_turn(INVERSE_INDEX[index], turn)
+
+
+def canonical_code(code, colour_swap=False):
+    # Returns (canonical code, symmetry index, swapped)
+    best, best_index, swapped = code, 0, False
+    for index in range(1, len(SYMMETRIES)):
+        candidate = transform_code(index, code)
+        if candidate < best:
+            best, best_index = candidate, index
+    if colour_swap:
+        swapped_code = swap_colours(code)
+        for index in range(len(SYMMETRIES)):
+            candidate = transform_code(index, swapped_code)
+            if candidate < best:
+                best, best_index, swapped = candidate, index, True
+    return best, best_index, swapped
+
+
+def canonicalize(code, action=None, colour_swap=False):
+    # Returns (canonical code, canonical action, symmetry index, swapped)
+    canonical, index, swapped = canonical_code(code, colour_swap)
+    if action is not None:
+        action = transform_action(index, action)
+    return canonical, action, index, swapped
@@ -0,0 +1,7 @@
+# conftest.py
+
+import os
+import sys
+
+# The modules import each other by their flat names, as the scripts run from Q_learning
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,52 @@
+# test_perft.py
+
+import pytest
+
+from benchmark import ENGINES, build_position, reference_turns
+from board import zobrist_hash
+from perft import Perft, run, snapshot
+
+POSITIONS = reference_turns(0)
+POSITIONS['start'] = []
+
+
+@pytest.mark.parametrize('name', ['start', 'placing_early', 'placing_late'])
+def test_undo_move_restores_every_position(name):
+    counts = []
+    for engine in ENGINES:
+        results = run(engine, POSITIONS[name], 2)
+        assert all(row['mismatches'] == 0 for row in results['depths'].values()), results
+        counts.append([row['nodes'] for row in results['depths'].values()])
+    assert counts[0] == counts[1]
+
+
+def walk_turns(game, depth):
+    # Makes and unmakes every turn depth turns deep, checking the state and
+    # the incremental hash after each step; returns the leaf count. Finished
+    # games are walked on too, so the 'moving' position exercises the moving
+    # phase.
+    if depth == 0:
+        return 1
+    before = snapshot(game)
+    leaves = 0
+    for turn in game.turns():
+        game.make_turn(turn)
+        assert game.hash == zobrist_hash(game.board, game.current_player, game.phase, game.player_pieces)
+        leaves += walk_turns(game, depth - 1)
+        game.unmake_turn()
+        assert snapshot(game) == before
+    return leaves
+
+
+@pytest.mark.parametrize('engine', list(ENGINES))
+@pytest.mark.parametrize('name', ['placing_early', 'placing_late', 'moving'])
+def test_unmake_turn_restores_board_and_hash(engine, name):
+    game = build_position(engine, POSITIONS[name])
+    assert walk_turns(game, 2) > 0
+
+
+@pytest.mark.parametrize('engine', list(ENGINES))
+def test_turns_match_perft_counts(engine):
+    # Every capture is a turn of its own, so a turn walk sees as many leaves as perft
+    game = build_position(engine, POSITIONS['placing_late'])
+    assert walk_turns(game, 2) == Perft(build_position(engine, POSITIONS['placing_late']), verify=False).count(2)
@@ -0,0 +1,54 @@
+# test_q_table_journal.py
+
+import os
+import random
+
+import pytest
+
+from bitboard_game import BitboardMorrisGame
+from board import ACTIONS
+from q_learning import QLearningAgent
+from q_table_journal import QTableJournal
+
+FILE_NAMES = {'dict': 'q_table.pkl', 'compact': 'q_table.npy', 'dense': 'q_table.npz'}
+
+
+def update_randomly(agent, count, rng):
+    for _ in range(count):
+        x_bits = rng.getrandbits(24)
+        state = agent.state_from_code(x_bits | (rng.getrandbits(24) & ~x_bits) << 24)
+        agent.set_q_value(state, rng.choice(ACTIONS), rng.randrange(1, 1 << 20) / 1024)
+
+
+def entries(agent):
+    return {key: value for key, value in agent.q_table.items() if value}
+
+
+@pytest.mark.parametrize('backend', ['dict', 'compact', 'dense'])
+def test_journal_replay_matches_table(tmp_path, backend):
+    path = str(tmp_path / FILE_NAMES[backend])
+    rng = random.Random(backend)
+    agent = QLearningAgent(BitboardMorrisGame(), q_table_file=path, backend=backend, journal=True)
+    for _ in range(3):
+        update_randomly(agent, 200, rng)
+        agent.save_q_table()
+    assert os.path.exists(path + '.journal')
+    loaded = QLearningAgent(BitboardMorrisGame(), q_table_file=path, backend=backend)
+    assert entries(loaded) == entries(agent)
+
+
+@pytest.mark.parametrize('backend', ['dict', 'compact', 'dense'])
+def test_compaction_keeps_table(tmp_path, backend):
+    path = str(tmp_path / FILE_NAMES[backend])
+    rng = random.Random(backend)
+    agent = QLearningAgent(BitboardMorrisGame(), q_table_file=path, backend=backend)
+    agent.journal = QTableJournal(path, backend, min_compact_records=100, background=False)
+    for _ in range(3):
+        update_randomly(agent, 200, rng)
+        agent.save_q_table()
+    update_randomly(agent, 10, rng)
+    agent.close_q_table()
+    assert os.path.exists(path)
+    assert not os.path.exists(path + '.journal.compacting')
+    loaded = QLearningAgent(BitboardMorrisGame(), q_table_file=path, backend=backend)
+    assert entries(loaded) == entries(agent)
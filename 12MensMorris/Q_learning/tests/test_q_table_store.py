@@ -0,0 +1,91 @@
+# test_q_table_store.py
+
+import random
+
+import numpy as np
+import pytest
+
+from board import ACTION_IDS, ACTIONS
+from q_table_store import CompactQTable, DenseQTable
+
+
+def random_entries(count, seed=0):
+    rng = random.Random(seed)
+    entries = {}
+    for _ in range(count):
+        x_bits = rng.getrandbits(24)
+        state = x_bits | (rng.getrandbits(24) & ~x_bits) << 24
+        # float32-exact values, so the tables can be compared with ==
+        entries[(state, rng.choice(ACTIONS))] = rng.randrange(1, 1 << 20) / 1024
+    return entries
+
+
+def test_compact_table_grows_and_keeps_entries():
+    entries = random_entries(5000)
+    table = CompactQTable(capacity=4)
+    for key, value in entries.items():
+        table[key] = value
+    assert len(table) == len(entries)
+    assert dict(table.items()) == entries
+    assert all(table.get(key) == value for key, value in entries.items())
+    assert table.get((1, 0), -1.0) == -1.0
+    assert (1, 0) not in table
+
+
+@pytest.mark.parametrize('mmap_mode', [None, 'r', 'r+'])
+def test_compact_table_save_load(tmp_path, mmap_mode):
+    entries = random_entries(1000)
+    table = CompactQTable()
+    for key, value in entries.items():
+        table[key] = value
+    path = str(tmp_path / 'q_table.npy')
+    table.save(path)
+    loaded = CompactQTable.load(path, mmap_mode)
+    assert dict(loaded.items()) == entries
+    assert all(loaded[key] == value for key, value in entries.items())
+
+
+def test_compact_table_updates_mapped_file_in_place(tmp_path):
+    entries = random_entries(100)
+    table = CompactQTable()
+    for key, value in entries.items():
+        table[key] = value
+    path = str(tmp_path / 'q_table.npy')
+    table.save(path)
+    key = next(iter(entries))
+    CompactQTable.load(path, 'r+')[key] = 0.25
+    assert CompactQTable.load(path).get(key) == 0.25
+    with pytest.raises(TypeError):
+        CompactQTable.load(path, 'r')[key] = 0.5
+
+
+def test_dense_table_grows_and_keeps_entries(tmp_path):
+    entries = random_entries(5000)
+    table = DenseQTable(capacity=1)
+    for key, value in entries.items():
+        table[key] = value
+    assert len(table) == len({state for state, _ in entries})
+    assert dict(table.items()) == entries
+    assert all(table.get(key) == value for key, value in entries.items())
+    path = str(tmp_path / 'q_table.npz')
+    table.save(path)
+    assert dict(DenseQTable.load(path).items()) == entries
+    snapshot = table.snapshot()
+    table[next(iter(entries))] = 0.5
+    assert dict(snapshot.items()) == entries
+
+
+def test_dense_table_batch_lookup_matches_single_entries():
+    entries = random_entries(1000)
+    table = DenseQTable()
+    for key, value in entries.items():
+        table[key] = value
+    states = [state for state, _ in entries] + [1, 2]
+    rows = table.q_rows(states)
+    for (state, action), value in entries.items():
+        assert rows[states.index(state), ACTION_IDS[action]] == value
+    assert not rows[-2:].any()
+    assert (table.lookup([1, 2]) == -1).all()
+    created = table.lookup(np.array([[1, 2], [2, 1]]), create=True)
+    assert created[0, 0] == created[1, 1] != created[0, 1] == created[1, 0]
+    assert len(table) == len({state for state, _ in entries}) + 2
@@ -0,0 +1,44 @@
+# test_symmetry.py
+
+import random
+
+import pytest
+
+from bitboard_game import BitboardMorrisGame
+from board import decode_board
+from symmetry import SYMMETRIES, canonical_code, restore_turn, transform_code, transform_turn
+
+
+def random_codes(count, seed=0):
+    rng = random.Random(seed)
+    codes = []
+    for _ in range(count):
+        x_bits = rng.getrandbits(24) & rng.getrandbits(24)
+        codes.append(x_bits | (rng.getrandbits(24) & rng.getrandbits(24) & ~x_bits) << 24)
+    return codes
+
+
+@pytest.mark.parametrize('colour_swap', [False, True])
+def test_canonical_code_is_the_same_for_every_symmetric_position(colour_swap):
+    for code in random_codes(200):
+        canonical = canonical_code(code, colour_swap)[0]
+        for index in range(len(SYMMETRIES)):
+            assert canonical_code(transform_code(index, code), colour_swap)[0] == canonical
+
+
+def test_canonical_index_maps_position_to_canonical_code():
+    for code in random_codes(200):
+        canonical, index, _ = canonical_code(code)
+        assert transform_code(index, code) == canonical
+
+
+def test_turns_transform_with_the_board():
+    for code in random_codes(50, seed=1):
+        board = decode_board(code)
+        for phase in ('placing', 'moving'):
+            game = BitboardMorrisGame.from_board(board, 'X', phase)
+            for index in range(len(SYMMETRIES)):
+                image = BitboardMorrisGame.from_board(decode_board(transform_code(index, code)), 'X', phase)
+                turns = game.turns()
+                assert sorted(transform_turn(index, turn) for turn in turns) == sorted(image.turns())
+                assert [restore_turn(index, transform_turn(index, turn)) for turn in turns] == turns
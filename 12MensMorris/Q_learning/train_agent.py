@@ -1,50 +1,104 @@
 # train_agent.py
 
-from game import MorrisGame
+import numpy as np
+
+from bitboard_game import BitboardMorrisGame
+from board import ACTION_IDS, ACTIONS, NUM_ACTIONS
 from q_learning import QLearningAgent
-from minimax import MinimaxAlgorithm
+from eval_cache import EvaluationCache
+from headless_train import reward_for
+from minimax import MinimaxAlgorithm, load_weights
+from replay_buffer import ReplayBuffer
+
+# Games end once all 24 pieces are placed; this only guards against a stuck game
+MAX_PLIES = 200
+
+def legal_mask(valid_moves):
+    mask = np.zeros(NUM_ACTIONS, dtype=bool)
+    mask[[ACTION_IDS[move] for move in valid_moves]] = True
+    return mask
 
-def play_game(agent, minimax, max_depth):
-    game = MorrisGame()
+def learn(agent, replay, transition, reward, next_state, next_code, next_valid_moves, done):
+    # transition is the agent's (state, position code, action) from its previous turn
+    state, state_code, action = transition
+    agent.update_q_value(state, action, reward, next_state, next_valid_moves)
+    agent.decay_epsilon()
+    if replay is not None:
+        replay.add(state_code, ACTION_IDS[action], reward, next_code, done, legal_mask(next_valid_moves))
+
+def play_game(agent, minimax, max_depth, move_time_ms=None, replay=None):
+    # Each of the agent's transitions runs to its next turn, after minimax has
+    # replied; the last one carries the game's result and no next moves
+    game = BitboardMorrisGame()
     agent.game = game
     minimax.game = game
+    minimax.new_game()
+    plies = 0
+    pending = None  # The agent's last (state, position code, action)
 
-    while not game.check_winner() and game.moves_made < 24:
+    while not game.check_winner() and game.moves_made < 24 and plies < MAX_PLIES:
         if game.current_player == 'X':
             # Q-Learning agent's turn
             state = agent.get_state()
+            state_code = game.position_code()
             valid_moves = game.get_all_valid_moves()
+            if pending is not None:
+                learn(agent, replay, pending, 0, state, state_code, valid_moves, False)
             action = agent.choose_action(valid_moves)
             if action is None:
                 break
-            result = game.make_move(action[0], action[1])
-            next_state = agent.get_state()
-            next_valid_moves = game.get_all_valid_moves()
-            reward = 1 if game.check_winner() else 0
-            agent.update_q_value(state, action, reward, next_state, next_valid_moves)
-            agent.decay_epsilon()
+            result = game.make_move(action) if isinstance(action, int) else game.make_move(*action)
+            pending = (state, state_code, action)
+            if result == 'mill':
+                game.switch_player()
         else:
-            # Minimax algorithm's turn
-            best_move = minimax.find_best_move(max_depth)
-            if best_move is None:
+            # Minimax algorithm's turn; make_turn makes its capture and passes the turn
+            best_turn = minimax.find_best_turn(max_depth, time_limit_ms=move_time_ms)
+            if best_turn is None:
                 break
-            game.make_move(best_move[0], best_move[1])
+            game.make_turn(best_turn)
+
+        plies += 1
 
-        game.switch_player()
+    if pending is not None:
+        learn(agent, replay, pending, reward_for(game.check_winner(), 'X'), agent.get_state(),
+              game.position_code(), [], True)
 
     # Save Q-Table after each game
     agent.save_q_table()
 
+def learn_from_replay(agent, replay, batch_size=64, prioritized=True):
+    # Replays stored transitions, so each minimax-played game is learned from many times
+    indices, batch, weights = replay.sample(batch_size, prioritized)
+    states, actions, rewards, next_states, dones, next_masks = batch
+    if agent.backend == 'dense':
+        td_errors = agent.batch_update(states, actions, rewards, next_states, next_masks, dones, weights=weights)
+    else:
+        td_errors = []
+        for i in range(len(indices)):
+            next_valid_moves = [] if dones[i] else [ACTIONS[a] for a in np.flatnonzero(next_masks[i])]
+            td_errors.append(agent.update_q_value(agent.state_from_code(int(states[i])), ACTIONS[actions[i]],
+                                                  float(rewards[i]), agent.state_from_code(int(next_states[i])),
+                                                  next_valid_moves, float(weights[i])))
+    replay.update_priorities(indices, td_errors)
+
 def main():
-    game = MorrisGame()
-    agent = QLearningAgent(game)
-    minimax = MinimaxAlgorithm(game)
+    game = BitboardMorrisGame()
+    agent = QLearningAgent(game, journal=True)
+    minimax = MinimaxAlgorithm(game, weights=load_weights(), eval_cache=EvaluationCache())
+    # Pass a directory as path to keep the buffer on disk between runs
+    replay = ReplayBuffer(100000)
 
     num_games = 1000
     max_depth = 3
+    move_time_ms = 200
+    replay_batches = 8
 
     for _ in range(num_games):
-        play_game(agent, minimax, max_depth)
+        play_game(agent, minimax, max_depth, move_time_ms, replay)
+        for _ in range(replay_batches):
+            learn_from_replay(agent, replay)
+    agent.close_q_table()
 
     print("Training complete.")
 
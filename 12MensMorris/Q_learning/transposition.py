@@ -0,0 +1,75 @@
+# transposition.py
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Rough cost of one stored entry in CPython (slot pointers plus the int and
+# float objects they hold), used to turn a memory cap into an entry count
+ENTRY_BYTES = 160
+
+
+class TranspositionTable:
+    # Fixed-size table indexed by the low bits of the position hash. Each index
+    # holds a two-slot bucket: the first slot keeps the deepest result seen in
+    # the current search, the second is always overwritten. Entries left over
+    # from earlier searches can be replaced regardless of depth.
+
+    def __init__(self, max_entries=1 << 18, max_memory_mb=None):
+        if max_memory_mb is not None:
+            max_entries = max_memory_mb * 1024 * 1024 // ENTRY_BYTES
+        size = 2
+        while size * 2 <= max_entries:
+            size *= 2
+        self.size = size
+        self.mask = size - 2  # Bucket index, always even
+        self.keys = [None] * size
+        self.depths = [0] * size
+        self.values = [0.0] * size
+        self.flags = [EXACT] * size
+        self.moves = [None] * size
+        self.ages = [0] * size
+        self.age = 0
+        self.stored = 0
+
+    def new_search(self):
+        self.age += 1
+
+    def clear(self):
+        size = self.size
+        self.keys = [None] * size
+        self.depths = [0] * size
+        self.values = [0.0] * size
+        self.flags = [EXACT] * size
+        self.moves = [None] * size
+        self.ages = [0] * size
+        self.age = 0
+        self.stored = 0
+
+    def probe(self, key):
+        # Returns (depth, value, flag, move) or None
+        index = key & self.mask
+        keys = self.keys
+        if keys[index] == key:
+            return self.depths[index], self.values[index], self.flags[index], self.moves[index]
+        index += 1
+        if keys[index] == key:
+            return self.depths[index], self.values[index], self.flags[index], self.moves[index]
+        return None
+
+    def store(self, key, depth, value, flag, move=None):
+        index = key & self.mask
+        if self.keys[index] is not None and self.keys[index] != key \
+                and self.ages[index] == self.age and self.depths[index] > depth:
+            index += 1
+        if self.keys[index] is None:
+            self.stored += 1
+        self.keys[index] = key
+        self.depths[index] = depth
+        self.values[index] = value
+        self.flags[index] = flag
+        self.moves[index] = move
+        self.ages[index] = self.age
+
+    def memory_estimate(self):
+        return self.size * ENTRY_BYTES